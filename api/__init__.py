@@ -1,7 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import logging
+import time
+
+from metrics import (
+    TELEGRAM_BUDGET_WAIT_SECONDS, TELEGRAM_FLOOD_WAIT_SECONDS, TELEGRAM_REQUEST_SECONDS, TELEGRAM_REQUESTS
+)
+
 # import Telethon API modules
 from telethon import TelegramClient, types
+from telethon.errors import FloodWaitError
 from telethon.tl.functions.channels import GetChannelsRequest, GetFullChannelRequest, GetParticipantsRequest
 from telethon.tl.functions.messages import GetHistoryRequest, GetDiscussionMessageRequest, GetWebPageRequest
 from telethon.tl.functions.users import GetFullUserRequest
@@ -9,6 +18,82 @@ from telethon.tl.functions.photos import GetUserPhotosRequest
 from telethon.tl.functions.stats import GetBroadcastStatsRequest
 
 
+class RequestBudget:
+    """
+    Global request-rate budget shared by every coroutine using one client.
+
+    Token bucket refilled at `rate` requests per second, allowing bursts of up
+    to `burst` requests. A FloodWaitError pauses the whole budget, so every
+    worker backs off for the duration Telegram asked for, not only the one that
+    hit the limit.
+    """
+
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """
+        Stop handing out requests for `seconds`
+        :param seconds: FloodWaitError duration
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """
+        Wait until one request may be sent
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def call_with_budget(budget, request, *args, max_flood_retries=5, **kwargs):
+    """
+    Run an API request under the shared budget, honouring FloodWaitError
+    :param budget: RequestBudget shared by all workers
+    :param request: one of the request coroutines of this module
+    :param max_flood_retries: give up after this many flood waits
+    :return: request output
+    """
+    method = request.__name__
+    for attempt in range(max_flood_retries + 1):
+        waited = time.perf_counter()
+        await budget.acquire()
+        started = time.perf_counter()
+        TELEGRAM_BUDGET_WAIT_SECONDS.observe(started - waited)
+        outcome = 'error'
+        try:
+            result = await request(*args, **kwargs)
+            outcome = 'ok'
+            return result
+        except FloodWaitError as e:
+            outcome = 'flood_wait'
+            TELEGRAM_FLOOD_WAIT_SECONDS.labels(method).inc(e.seconds)
+            if attempt == max_flood_retries:
+                raise
+            logging.warning(f"FloodWait of {e.seconds}s on {method}, pausing all requests")
+            budget.pause(e.seconds)
+        finally:
+            TELEGRAM_REQUEST_SECONDS.labels(method).observe(time.perf_counter() - started)
+            TELEGRAM_REQUESTS.labels(method, outcome).inc()
+
+
 async def get_connection(session_file, api_id, api_hash, phone):
     """
     Get connection to Telegram API
@@ -32,6 +117,13 @@ async def get_connection(session_file, api_id, api_hash, phone):
     return client
 
 
+async def get_account_id(client: TelegramClient):
+    """
+    Telegram user id of the account the client is logged in with
+    """
+    return (await client.get_me(input_peer=True)).user_id
+
+
 async def get_entity_attrs(client: TelegramClient, source):
     """
     Get channel main attributes
@@ -95,11 +187,13 @@ async def get_participants_request(client, source):
     )
 
 
-async def get_posts(client, source, offset_date, min_id=0, offset_id=0):
+async def get_posts(client, source, offset_date, min_id=0, offset_id=0, limit=100):
     """
     get posts
     Source: entity (str | int | Peer | InputPeer)
         More on InputPeer: https://tl.telethon.dev/types/input_peer.html
+    min_id: only return messages newer than this id
+    offset_id: only return messages older than this id (pagination)
 
     Reference:
         Telethon: https://tl.telethon.dev/methods/messages/get_history.html
@@ -110,7 +204,7 @@ async def get_posts(client, source, offset_date, min_id=0, offset_id=0):
         GetHistoryRequest(
             peer=source,
             hash=0,
-            limit=100,
+            limit=limit,
             max_id=0,
             min_id=min_id,
             offset_id=offset_id,
@@ -0,0 +1,190 @@
+import argparse
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+# before the project imports, some of them read their settings at import time
+load_dotenv()
+
+from db.engine import get_engine
+from db.models import BackfillCheckpoint
+from embeddings import embedder_name, get_embedder
+
+# rows read, encoded and written per batch
+BACKFILL_BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', 1000))
+# encoding processes, each loads its own copy of the embedder
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', os.cpu_count() or 1))
+
+# keyset pagination over the post_texts primary key, only rows still missing a vector
+_SELECT_BATCH = text("""
+    SELECT peer_id, id, date, message
+    FROM post_texts
+    WHERE embedding IS NULL
+      AND btrim(message) <> ''
+      AND (peer_id, id, date) > (:peer_id, :post_id, :date)
+    ORDER BY peer_id, id, date
+    LIMIT :limit
+""")
+
+# one statement per batch instead of one UPDATE per row
+_UPDATE_BATCH = text("""
+    UPDATE post_texts AS pt
+    SET embedding = v.embedding::vector
+    FROM unnest(:peer_ids, :post_ids, :dates, :embeddings) AS v(peer_id, id, date, embedding)
+    WHERE pt.peer_id = v.peer_id AND pt.id = v.id AND pt.date = v.date
+""")
+
+# key smaller than every post_texts key, start of a fresh backfill
+_START_KEY = (-2 ** 31, -2 ** 31, datetime(1, 1, 1).date())
+
+_worker_embedder = None
+
+
+def _init_worker(name):
+    global _worker_embedder
+    _worker_embedder = get_embedder(name)
+
+
+def _encode(messages):
+    """
+    Runs in a pool process: embeddings of `messages` as pgvector text literals
+    """
+    return ['[' + ','.join(map(str, vector)) + ']' for vector in _worker_embedder.embed(messages)]
+
+
+def load_checkpoint(engine, name):
+    """
+    :return: (last key handled, rows done) of the job, the start key for a new job
+    """
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT peer_id, post_id, date, rows_done FROM backfill_checkpoints WHERE name = :name"),
+            {"name": name}
+        ).first()
+    if row is None or row.peer_id is None:
+        return _START_KEY, 0
+    return (row.peer_id, row.post_id, row.date), row.rows_done
+
+
+def _save_checkpoint(conn, name, key, rows_done):
+    values = {
+        'name': name, 'peer_id': key[0], 'post_id': key[1], 'date': key[2],
+        'rows_done': rows_done, 'updated_at': datetime.now(timezone.utc)
+    }
+    stmt = insert(BackfillCheckpoint.__table__).values(values)
+    conn.execute(stmt.on_conflict_do_update(index_elements=['name'], set_={
+        c: stmt.excluded[c] for c in ('peer_id', 'post_id', 'date', 'rows_done', 'updated_at')
+    }))
+
+
+def checkpoint_name(embedder):
+    return f"embedding:{embedder}"
+
+
+def reset_checkpoint(engine, name):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM backfill_checkpoints WHERE name = :name"), {"name": name})
+
+
+def _read_batch(engine, key, batch_size):
+    with engine.connect() as conn:
+        return conn.execute(_SELECT_BATCH, {
+            "peer_id": key[0], "post_id": key[1], "date": key[2], "limit": batch_size
+        }).fetchall()
+
+
+def _write_batch(engine, name, rows, embeddings, rows_done):
+    # vectors and checkpoint commit together: a crash never skips or repeats a batch
+    with engine.begin() as conn:
+        conn.execute(_UPDATE_BATCH, {
+            "peer_ids": [row.peer_id for row in rows],
+            "post_ids": [row.id for row in rows],
+            "dates": [row.date for row in rows],
+            "embeddings": embeddings,
+        })
+        last = rows[-1]
+        _save_checkpoint(conn, name, (last.peer_id, last.id, last.date), rows_done)
+
+
+def run_backfill(engine, embedder=None, batch_size=BACKFILL_BATCH_SIZE, workers=BACKFILL_WORKERS,
+                 max_rows=None):
+    """
+    Embed every post_texts row without a vector, resuming after the stored checkpoint.
+
+    Batches are read in primary key order by the main process, encoded by the pool and
+    written back in the same order; at most two batches per worker are in memory.
+    :param engine: SQLAlchemy engine
+    :param embedder: embedder name, overrides EMBEDDER, the checkpoint is kept per embedder
+    :param batch_size: rows per batch
+    :param workers: encoding processes
+    :param max_rows: stop after roughly this many rows, None for the whole corpus
+    :return: rows embedded by this run
+    """
+    # the model is only loaded by the pool processes
+    selected = embedder_name(embedder)
+    if selected is None:
+        raise ValueError("Set EMBEDDER (or pass `embedder`) to choose the embedder to backfill with")
+    name = checkpoint_name(selected)
+
+    key, rows_done = load_checkpoint(engine, name)
+    logging.info(f"Backfill {name} with {workers} workers, batches of {batch_size}, "
+                 f"{rows_done} rows done before")
+
+    done = 0
+    started = time.monotonic()
+    pending = deque()
+    exhausted = False
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(selected,)) as pool:
+        while pending or not exhausted:
+            # keep the pool busy while bounding memory
+            while not exhausted and len(pending) < 2 * workers:
+                rows = _read_batch(engine, key, batch_size)
+                if not rows:
+                    exhausted = True
+                    break
+                key = (rows[-1].peer_id, rows[-1].id, rows[-1].date)
+                pending.append((rows, pool.submit(_encode, [row.message for row in rows])))
+                if max_rows is not None and done + len(pending) * batch_size >= max_rows:
+                    exhausted = True
+
+            if not pending:
+                break
+
+            rows, future = pending.popleft()
+            done += len(rows)
+            rows_done += len(rows)
+            _write_batch(engine, name, rows, future.result(), rows_done)
+
+            elapsed = time.monotonic() - started
+            logging.info(f"Backfilled {done} rows ({rows_done} total), {done / elapsed:,.0f} posts/s")
+
+    elapsed = time.monotonic() - started
+    logging.info(f"Backfill finished: {done} rows in {elapsed:.1f}s, {done / max(elapsed, 1e-9):,.0f} posts/s")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed stored posts that have no embedding yet")
+    parser.add_argument('--embedder', help="hashing or sentence-transformers, defaults to EMBEDDER")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    parser.add_argument('--max-rows', type=int, help="stop after about this many rows, e.g. to measure throughput")
+    parser.add_argument('--reset', action='store_true', help="forget the checkpoint and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    engine = get_engine()
+
+    if args.reset:
+        reset_checkpoint(engine, checkpoint_name(embedder_name(args.embedder)))
+
+    run_backfill(engine, args.embedder, args.batch_size, args.workers, args.max_rows)
@@ -1,20 +1,26 @@
-import pandas as pd
 import asyncio
 import time
-from api import *
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
-from tqdm import tqdm
-from db.models import Channel, PostText
 from dotenv import load_dotenv
-import os
-import logging
-from datetime import datetime, timedelta
 
+# before the project imports, some of them read their settings at import time
 load_dotenv()
 
-connection_string = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:5432/{os.getenv('DB_NAME')}"
-engine = create_engine(connection_string)
+from api import *
+from telethon.errors import RPCError
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from db.engine import get_engine
+from db.models import Channel, ChannelAccessHash
+from db.ingest import (
+    upsert_access_hashes, upsert_channels, upsert_post_texts, insert_post_entities, advance_last_seen_msg_id
+)
+from db.rows import full_channel_row, normalize_chats, normalize_messages, with_embeddings
+from db.partitions import ensure_partitions_for, maintain_partitions
+from embeddings import get_embedder
+from metrics import POSTS_FETCHED, POSTS_STORED, export
+import os
+import logging
+from datetime import datetime, timedelta, timezone
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logging.info(f"Init program at {time.ctime()}")
@@ -25,173 +31,287 @@ api_id = os.getenv('API_ID')
 api_hash = os.getenv('API_HASH')
 phone = os.getenv('PHONE')
 
+# concurrent harvesting limits
+HARVEST_CONCURRENCY = int(os.getenv('HARVEST_CONCURRENCY', 8))
+HARVEST_RATE = float(os.getenv('HARVEST_RATE', 1.0))
+HARVEST_BURST = int(os.getenv('HARVEST_BURST', 5))
+
+# incremental fetching
+POSTS_PAGE_SIZE = 100
+INITIAL_LOOKBACK_DAYS = int(os.getenv('INITIAL_LOOKBACK_DAYS', 1))
+
+# username resolution cache
+ENTITY_CACHE_TTL_DAYS = int(os.getenv('ENTITY_CACHE_TTL_DAYS', 7))
+RESOLVE_BATCH_SIZE = 100
+
 
 def save_channel_data(channel_request, channel):
     logging.info("Saving channel data")
-    full_channel_data = channel_request.to_dict()
+    row = full_channel_row(channel_request)
+    if row is None or row[2].lower() != channel.lower():
+        logging.info(f"No full channel data for {channel}")
+        return
+
+    with get_engine().begin() as conn:
+        counts = upsert_channels(conn, [row])
+    logging.info(f"Channels inserted: {counts['inserted']}, updated: {counts['updated']}, "
+                 f"unchanged: {counts['unchanged']}")
+
+
+def get_last_seen_msg_id(channel_id: int) -> int:
+    with Session(get_engine()) as session:
+        order = session.query(Channel).filter_by(id=channel_id).first()
+        if order is None or order.last_seen_msg_id is None:
+            return 0
+        return order.last_seen_msg_id
+
+
+async def fetch_new_posts(client, budget: RequestBudget, peer, min_id: int):
+    """
+    Page backwards from the newest post until the stored cursor is reached.
+    :param min_id: last message id already stored, 0 for a channel never fetched
+    :return: (messages, chats) collected over all pages
+    """
+    # a channel without cursor is not backfilled further than the lookback
+    cutoff = datetime.now(timezone.utc) - timedelta(days=INITIAL_LOOKBACK_DAYS) if min_id == 0 else None
+
+    messages, chats = [], {}
+    offset_id = 0
+    while True:
+        page = await call_with_budget(budget, get_posts, client, peer, offset_date=None,
+                                      min_id=min_id, offset_id=offset_id, limit=POSTS_PAGE_SIZE)
+        if not page.messages:
+            break
+
+        messages.extend(page.messages)
+        chats.update({chat.id: chat for chat in page.chats})
+        offset_id = min(msg.id for msg in page.messages)
+
+        if len(page.messages) < POSTS_PAGE_SIZE:
+            break
+        if cutoff is not None and min(msg.date for msg in page.messages) < cutoff:
+            break
+
+    return messages, list(chats.values())
+
+
+def save_posts(channel_id: int, messages: list, chats: list) -> dict:
+    """
+    Store fetched posts, their entities and the new cursor in one transaction
+    :return: inserted, updated and unchanged post counts
+    """
+    if not messages:
+        return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    logging.info(f"Collected posts count: {len(messages)}")
+
+    post_texts, post_entities = normalize_messages(messages)
+    post_texts = with_embeddings(post_texts, get_embedder())
+    ensure_partitions_for(get_engine(), [msg.date for msg in messages])
+
+    # one transaction for the whole page
+    with get_engine().begin() as conn:
+        upsert_channels(conn, normalize_chats(chats), update=False)
+        counts = upsert_post_texts(conn, post_texts)
+        entity_counts = insert_post_entities(conn, post_entities)
+        # the cursor moves in the same transaction as the posts it covers
+        advance_last_seen_msg_id(conn, channel_id, max(msg.id for msg in messages))
+
+    logging.info(f"Posts inserted: {counts['inserted']}, updated: {counts['updated']}, "
+                 f"unchanged: {counts['unchanged']}; entities inserted: {entity_counts['inserted']}")
+    return counts
+
+
+def load_entity_cache(channels: list, account: int) -> dict:
+    """
+    Cached resolutions of `account` for the given usernames, keyed by lower-case username.
+    Without one of its own, the account gets the legacy channels.access_hash with no
+    resolved_at, so that it is refreshed before use.
+    """
+    usernames = [channel.lower() for channel in channels]
+    with Session(get_engine()) as session:
+        rows = session.query(
+            Channel.id, Channel.username,
+            func.coalesce(ChannelAccessHash.access_hash, Channel.access_hash).label('access_hash'),
+            ChannelAccessHash.resolved_at
+        ).outerjoin(
+            ChannelAccessHash,
+            and_(ChannelAccessHash.channel_id == Channel.id, ChannelAccessHash.account == account)
+        ).filter(func.lower(Channel.username).in_(usernames)).all()
+    return {row.username.lower(): row for row in rows}
+
+
+def save_entity_cache(entities: list, account: int) -> None:
+    resolved_at = datetime.now(timezone.utc)
+    channels = [
+        {
+            'id': entity.id,
+            'title': entity.title,
+            'username': entity.username,
+            'date': entity.date,
+            'fake': entity.fake
+        }
+        for entity in entities
+    ]
+    access_hashes = [
+        {
+            'channel_id': entity.id,
+            'account': account,
+            'access_hash': entity.access_hash,
+            'resolved_at': resolved_at
+        }
+        for entity in entities
+    ]
+    with get_engine().begin() as conn:
+        upsert_channels(conn, channels)
+        upsert_access_hashes(conn, access_hashes)
+
+
+async def resolve_channels(client, budget: RequestBudget, channels: list) -> dict:
+    """
+    Map usernames to InputPeerChannel with as few ResolveUsername calls as possible.
+
+    Fresh cache entries are used as is, stale ones are refreshed in batches through
+    GetChannelsRequest and only unknown usernames (or ones whose channel changed its
+    username) are resolved one by one. Access hashes are only valid for the account
+    they were issued to: the cache is kept per account.
+    :return: dict username -> InputPeerChannel
+    """
+    account = await call_with_budget(budget, get_account_id, client)
+    cache = await asyncio.to_thread(load_entity_cache, channels, account)
+    stale_before = datetime.now(timezone.utc) - timedelta(days=ENTITY_CACHE_TTL_DAYS)
+
+    resolved, stale, missing = {}, [], []
+    for channel in channels:
+        row = cache.get(channel.lower())
+        if row is None or row.access_hash is None:
+            missing.append(channel)
+        elif row.resolved_at is None or row.resolved_at < stale_before:
+            stale.append((channel, row))
+        else:
+            resolved[channel] = types.InputPeerChannel(row.id, row.access_hash)
+
+    refreshed = []
+    for i in range(0, len(stale), RESOLVE_BATCH_SIZE):
+        batch = stale[i:i + RESOLVE_BATCH_SIZE]
+        try:
+            response = await call_with_budget(
+                budget, get_channel_req, client,
+                [types.InputPeerChannel(row.id, row.access_hash) for _, row in batch]
+            )
+        except RPCError as e:
+            logging.warning(f"Batch refresh of {len(batch)} channels failed ({e}), resolving them by username")
+            missing.extend(channel for channel, _ in batch)
+            continue
+
+        chats = {chat.id: chat for chat in response.chats if getattr(chat, 'username', None)}
+        for channel, row in batch:
+            chat = chats.get(row.id)
+            if chat is not None and chat.username.lower() == channel.lower():
+                resolved[channel] = types.InputPeerChannel(chat.id, chat.access_hash)
+                refreshed.append(chat)
+            else:
+                missing.append(channel)
 
-    full_channel_data.pop('_', None)
-    full_channel_data.pop('users', None)
+    for channel in missing:
+        try:
+            entity = await call_with_budget(budget, get_entity_attrs, client, channel)
+        except Exception as e:
+            logging.error(f"Could not resolve channel {channel}: {e}")
+            continue
+        resolved[channel] = types.InputPeerChannel(entity.id, entity.access_hash)
+        refreshed.append(entity)
 
-    fields = ['id', 'about', 'participants_count', 'linked_chat_id', 'pts', 'pinned_msg_id']
+    logging.info(f"Resolved {len(resolved)}/{len(channels)} channels: {len(stale)} refreshed in batches, "
+                 f"{len(missing)} by username")
+    if refreshed:
+        await asyncio.to_thread(save_entity_cache, refreshed, account)
 
-    full_channel_data['full_chat'] = {k: i for k, i in full_channel_data['full_chat'].items() if k in fields}
+    return resolved
 
-    fields = ['id', 'title', 'username', 'date', 'fake']
 
-    full_channel_data['chats'] = [
-        {k: i for k, i in d.items() if k in fields} for d in full_channel_data['chats']
-    ]
-    full_channel_data = pd.DataFrame(full_channel_data['chats']) \
-        .merge(pd.DataFrame([full_channel_data['full_chat']]), how='left')
-    full_channel_data = full_channel_data.loc[full_channel_data['username'] == channel, :]
-    full_channel_data = full_channel_data.loc[full_channel_data['participants_count'].notnull(), :]
-    #full_channel_data = pd.DataFrame([full_channel_data['full_chat']])
-    with Session(engine) as session:
-        logging.info("Session started")
-        for i, row in tqdm(full_channel_data.iterrows(), total=len(full_channel_data)):
-            order = session.query(Channel).filter_by(id=row['id']).first()
-            logging.debug(f"Processing channel ID: {row['id']}")
-            if order is None:
-                if row['username'] is not None:
-                    logging.info(f"Adding new channel: {row['title']}")
-                    order = Channel(
-                        id=row['id'],
-                        title=row['title'],
-                        username=row['username'],
-                        about=row['about'],
-                        participants_count=row['participants_count'],
-                        date=row['date'],
-                        fake=row['fake'],
-                        pts=row['pts'],
-                        pinned_msg_id=row['pinned_msg_id'],
-                        linked_chat_id=row['linked_chat_id']
-                    )
-                    session.add(order)
-                    session.commit()
-            else:
-                logging.info(f"Updating existing channel: {row['title']}")
-                order.title = row['title']
-                order.username = row['username']
-                order.about = row['about']
-                order.participants_count = row['participants_count']
-                order.date = row['date']
-                order.fake = row['fake']
-                order.pts = row['pts']
-                order.pinned_msg_id = row['pinned_msg_id']
-                order.linked_chat_id = row['linked_chat_id']
-                session.commit()
-
-
-def download_channel(channels: list) -> None:
-    # event loop
-    loop = asyncio.get_event_loop()
-    logging.info("Event loop created")
-
-    # Get `client` connection
-    client = loop.run_until_complete(
-        get_connection(sfile, api_id, api_hash, phone)
-    )
+async def process_channel(client, budget: RequestBudget, channel: str, peer) -> None:
+    logging.info(f"Processing channel: {channel}")
+
+    channel_id = peer.channel_id
+
+    # Collect Source -> GetFullChannelRequest
+    channel_request = await call_with_budget(budget, full_channel_req, client, peer)
+
+    # database writes are blocking, keep them off the event loop
+    await asyncio.to_thread(save_channel_data, channel_request, channel)
+
+    # Collect every post newer than the stored cursor
+    min_id = await asyncio.to_thread(get_last_seen_msg_id, channel_id)
+    messages, chats = await fetch_new_posts(client, budget, peer, min_id)
+    logging.info(f"Collected {len(messages)} new posts for channel ID: {channel_id} (after message {min_id})")
+
+    POSTS_FETCHED.labels(channel).inc(len(messages))
+
+    counts = await asyncio.to_thread(save_posts, channel_id, messages, chats)
+    for result, count in counts.items():
+        POSTS_STORED.labels(channel, result).inc(count)
+
+
+async def harvest_channels(channels: list, concurrency: int = HARVEST_CONCURRENCY,
+                           rate: float = HARVEST_RATE, burst: int = HARVEST_BURST) -> list:
+    """
+    Fetch many channels concurrently on a single client.
+    :param channels: channel usernames
+    :param concurrency: channels processed at the same time
+    :param rate: global Telegram requests per second
+    :param burst: requests that may be sent back to back
+    :return: channels that failed
+    """
+    client = await get_connection(sfile, api_id, api_hash, phone)
     logging.info("Client connection established")
 
-    # iterate channels
-    for channel in channels:
-        logging.info(f"Processing channel: {channel}")
-        try:
-            # Channel's attributes
-            entity_attrs = loop.run_until_complete(get_entity_attrs(client, channel))
-            logging.debug(f"Entity attributes: {entity_attrs}")
-
-            # Get Channel ID | convert output to dict
-            channel_id = entity_attrs.id
-
-            # Collect Source -> GetFullChannelRequest
-            channel_request = loop.run_until_complete(full_channel_req(client, channel_id))
-
-            save_channel_data(channel_request, channel)
-            yesterday = datetime.now() - timedelta(days=0)
-            # Collect posts
-            posts = loop.run_until_complete(get_posts(client, channel_id, offset_date=yesterday))  # , min_id=date
-            logging.info(f"Collected posts for channel ID: {channel_id}")
-
-            data = posts.to_dict()
-
-            logging.info(f"Collected posts count: {len(data['messages'])}")
-
-            df = pd.DataFrame(data['messages'])
-            df = df.loc[df['_'] == "Message",]
-            df.media = df.media.str['_']
-            df.peer_id = df.peer_id.str['channel_id'].astype('Int64')
-            df.reply_to = df.reply_to.str['reply_to_msg_id'].astype('Int64')
-            if df.replies.isna().mean() < 1:
-                df.replies = df.replies.str['channel_id'].astype('Int64')
-
-            if df.fwd_from.isna().mean() < 1:
-                df['fwd_from_channel_id'] = df.fwd_from.str['from_id'].str['channel_id'].astype('Int64')
-                df['fwd_from_channel_post'] = df.fwd_from.str['channel_post'].astype('Int64')
-
-            df.entities = df.entities.apply(lambda x: [i.get('url') for i in x if i.get('url')])
-
-            df = df.drop(['ttl_period', 'action', 'via_bot_id', 'restriction_reason', 'reply_markup', '_',
-                          'out', 'media_unread', 'silent', 'post', 'pinned', 'from_scheduled', 'fwd_from',
-                          'grouped_id', 'legacy', 'edit_hide', 'mentioned', 'post_author', 'from_id'], axis=1, errors='ignore')
-
-            post_texts = df.loc[df['message'].notnull(), ['id', 'peer_id', 'date', 'message', 'views', 'forwards',
-                                                          'edit_date']].reset_index(drop=True)
-            post_entities = df.loc[df['entities'].notnull(), ['id', 'peer_id', 'entities']].explode('entities')
-            post_entities = post_entities.loc[post_entities['entities'].notnull(), :].reset_index(drop=True)
-            fields = ['id', 'title', 'username', 'date', 'fake']
-            chats = pd.DataFrame(data['chats'])[fields]
-            with Session(engine) as session:
-                logging.info("Session started for saving posts and chats")
-                for i, row in tqdm(chats.iterrows(), total=len(chats)):
-                    order = session.query(Channel).filter_by(id=row['id']).first()
-                    if order is None:
-                        if pd.isna(row['username']) is False:
-                            order = Channel(
-                                id=row['id'],
-                                title=row['title'],
-                                username=row['username'],
-                                date=row['date'],
-                                fake=row['fake']
-                            )
-                            session.add(order)
-                            session.commit()
-                    else:
-                        pass
-
-                for i, row in tqdm(post_texts.iterrows(), total=len(post_texts)):
-                    order = session.query(PostText).filter_by(id=row['id'],
-                                                               peer_id=row['peer_id']).first()
-                    if order is None:
-                        order = PostText(
-                            id=row['id'],
-                            peer_id=row['peer_id'],
-                            date=row['date'],
-                            message=row['message'],
-                            views=row['views'],
-                            forwards=row['forwards']
-                        )
-                        session.add(order)
-                        session.commit()
-                    else:
-                        pass
-
-
-            post_entities.to_sql('post_entities', engine, if_exists='append', index=False)
-
-            # sleep program for a few seconds
-            if len(channels) > 1:
-                logging.info("Sleeping for 60 seconds")
-                time.sleep(60)
-        except Exception as e:
-            logging.error(f"Error processing channel {channel}: {e}")
-            logging.info(f"Failed channel: {channel}")
+    # surface every FloodWaitError so the shared budget can pause all workers
+    client.flood_sleep_threshold = 0
+
+    budget = RequestBudget(rate=rate, burst=burst)
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = []
+
+    async def worker(channel, peer):
+        async with semaphore:
+            try:
+                await process_channel(client, budget, channel, peer)
+            except Exception as e:
+                logging.error(f"Error processing channel {channel}: {e}")
+                logging.info(f"Failed channel: {channel}")
+                failed.append(channel)
+
+    try:
+        peers = await resolve_channels(client, budget, channels)
+        failed.extend(channel for channel in channels if channel not in peers)
+
+        await asyncio.gather(*(worker(channel, peer) for channel, peer in peers.items()))
+    finally:
+        await client.disconnect()
+
+    return failed
+
+
+def download_channel(channels: list) -> list:
+    """
+    Store the new posts of the given channels
+    :return: channels that failed
+    """
+    # next months' partitions and the retention policy
+    maintain_partitions(get_engine())
+
+    failed = asyncio.run(harvest_channels(channels))
+    logging.info(f"Processed {len(channels) - len(failed)}/{len(channels)} channels")
 
     logging.info(f"End program at {time.ctime()}")
+    return failed
 
 
-if __name__ == '__main__':
-    channels = ['severnygorod', 'agapov_fi', 'karaulny', 'rusbrief', 'octgnews', 'tass_agency', 'baltnews', 'fontankaspb', 'dprunews', 'sp_1703', 'glavmedia', 'houseofcardseurope', 'good78news', 'rian_ru', 'belta_telegramm', 'radiogovoritmsk', 'bbbreaking', 'paperpaper_ru', 'nevnov', 'swodki', 'vzglyad_ru', 'parstodayrussian', 'ukraina_ru', 'solovievlive', 'rossiyaneevropa', 'online47news', 'riafan', 'radiomirby', 'dirtytatarstan', 'rgrunews', 'inosmichannel', 'sputnikby', 'rbc_news', 'ssigny', 'boyart777', 'lentadnya', 'radiosvoboda', 'kommersant', 'topspb_tv', 'allnews47', 'rt_russian', 'absatzmedia', 'match_tv', 'truekpru', 'bbcrussian', 'houseofcardsrussia', 'OdessaRussi', 'Novoeizdanie', 'rus_demiurge', 'stranaua', 'rbc_brief', 'aifonline', 'ostashkonews', 'dimsmirnov175', 'ateobreaking', 'infantmilitario', 'UAnotRU', 'smotri_media', 'thehandofthekremlin', 'leningrad_guide', 'izvestia', 'meduzalive', 'highlylikely20', 'rentv_news', 'znua_live', 'atn_btrc', 'vestiru24', 'chvkmedia', 'espresotb', 'kshulika', 'orientsouthrus', 'dwglavnoe', 'ZOVcrimea', 'Belarus_VPO', 'readovkanews', 'ranarod', 'gazetaru', 'nexta_live', 'ntvnews', 'uniannet', 'lady_north', 'fuckyouthatswhy', 'nstarikovru', 'new_militarycolumnist', 'mk_ru', 'lab365', 'go338', 'postovo', 'asphaltt', 'politkraina', 'rlz_the_kraken', 'ru2ch', 'bfmnews', 'russtrat', 'tv360', 'radio_sputnik', 'minut30', 'pluanews', 'rtvinews', 'interfaxonline', 'istorijaoruzijaz', 'currenttime', 'sputniklive', 'newsgrpua', 'srochnow', 'ukrpravda_news', 'first_political', 'oldlentach', 'RUSanctions', 'Pravda_Gerashchenko', 'warhistoryalconafter', 'ivan_utenkov13', 'TCH_channel', 'the_moscow_post', 'UkraineNow', 'openukraine', 'ukr_shvydko', 'lentachold', 'huyovy_kharkiv', 'kontext_channel', 'russica2', 'tvrain', 'operativnozsu', 'rus_now_news', 'voynareal', 'lachentyt', 'russianonwars', 'dmytrogordon_official', 'banksta', 'TolkoPoDely', 'rybar', 'rhymestg', 'ragnarockkyiv', 'ukraina24tv', 'bankrollo', 'truexanewsua', 'sheyhtamir1974', 'aleksandrsemchenko', 'tsaplienko', 'varlamov_news', 'DavydovIn', 'boris_rozhin', 'RVvoenkor', 'redacted6', 'zerkalo_io', 'voenacher', 'Mikle1On', 'UaOnlii', 'vchkogpu', 'kaktovottak', 'novosti_efir', 'shot_shot', 'insiderUKR', 'slavaded1337', 'bloodysx', 'breakingmash', 'readovkaru', 'ostorozhno_novosti', 'okoo_ukr', 'Cbpub', 'warfakes', 'montyan2', 'moscowmap', 'asupersharij', 'nevzorovtv', 'V_Zelenskiy_official', 'yurasumy']
+# Telegram channels to harvest
+channels_list = ['severnygorod', 'agapov_fi', 'karaulny', 'rusbrief', 'octgnews', 'tass_agency', 'baltnews', 'fontankaspb', 'dprunews', 'sp_1703', 'glavmedia', 'houseofcardseurope', 'good78news', 'rian_ru', 'belta_telegramm', 'radiogovoritmsk', 'bbbreaking', 'paperpaper_ru', 'nevnov', 'swodki', 'vzglyad_ru', 'parstodayrussian', 'ukraina_ru', 'solovievlive', 'rossiyaneevropa', 'online47news', 'riafan', 'radiomirby', 'dirtytatarstan', 'rgrunews', 'inosmichannel', 'sputnikby', 'rbc_news', 'ssigny', 'boyart777', 'lentadnya', 'radiosvoboda', 'kommersant', 'topspb_tv', 'allnews47', 'rt_russian', 'absatzmedia', 'match_tv', 'truekpru', 'bbcrussian', 'houseofcardsrussia', 'OdessaRussi', 'Novoeizdanie', 'rus_demiurge', 'stranaua', 'rbc_brief', 'aifonline', 'ostashkonews', 'dimsmirnov175', 'ateobreaking', 'infantmilitario', 'UAnotRU', 'smotri_media', 'thehandofthekremlin', 'leningrad_guide', 'izvestia', 'meduzalive', 'highlylikely20', 'rentv_news', 'znua_live', 'atn_btrc', 'vestiru24', 'chvkmedia', 'espresotb', 'kshulika', 'orientsouthrus', 'dwglavnoe', 'ZOVcrimea', 'Belarus_VPO', 'readovkanews', 'ranarod', 'gazetaru', 'nexta_live', 'ntvnews', 'uniannet', 'lady_north', 'fuckyouthatswhy', 'nstarikovru', 'new_militarycolumnist', 'mk_ru', 'lab365', 'go338', 'postovo', 'asphaltt', 'politkraina', 'rlz_the_kraken', 'ru2ch', 'bfmnews', 'russtrat', 'tv360', 'radio_sputnik', 'minut30', 'pluanews', 'rtvinews', 'interfaxonline', 'istorijaoruzijaz', 'currenttime', 'sputniklive', 'newsgrpua', 'srochnow', 'ukrpravda_news', 'first_political', 'oldlentach', 'RUSanctions', 'Pravda_Gerashchenko', 'warhistoryalconafter', 'ivan_utenkov13', 'TCH_channel', 'the_moscow_post', 'UkraineNow', 'openukraine', 'ukr_shvydko', 'lentachold', 'huyovy_kharkiv', 'kontext_channel', 'russica2', 'tvrain', 'operativnozsu', 'rus_now_news', 'voynareal', 'lachentyt', 'russianonwars', 'dmytrogordon_official', 'banksta', 'TolkoPoDely', 'rybar', 'rhymestg', 'ragnarockkyiv', 'ukraina24tv', 'bankrollo', 'truexanewsua', 'sheyhtamir1974', 'aleksandrsemchenko', 'tsaplienko', 'varlamov_news', 'DavydovIn', 'boris_rozhin', 'RVvoenkor', 'redacted6', 'zerkalo_io', 'voenacher', 'Mikle1On', 'UaOnlii', 'vchkogpu', 'kaktovottak', 'novosti_efir', 'shot_shot', 'insiderUKR', 'slavaded1337', 'bloodysx', 'breakingmash', 'readovkaru', 'ostorozhno_novosti', 'okoo_ukr', 'Cbpub', 'warfakes', 'montyan2', 'moscowmap', 'asupersharij', 'nevzorovtv', 'V_Zelenskiy_official', 'yurasumy']
 
-    download_channel(channels)
+
+if __name__ == '__main__':
+    download_channel(channels_list)
+    export()
@@ -0,0 +1,168 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from datetime import date
+
+# Only the standard library is imported here. Every subcommand imports what it needs when it
+# runs: `status` loads SQLAlchemy alone, Telethon, openai, slack_sdk, pandas and the ORM models
+# are only loaded by the commands that use them.
+
+# seconds `cli` plus the modules of `status` may take to import, checked by `bench`
+CLI_IMPORT_BUDGET = float(os.getenv('CLI_IMPORT_BUDGET', 0.5))
+# modules timed by `bench`, the first ones are on the fast path
+BENCH_MODULES = ('cli', 'db.engine', 'pipeline', 'backfill', 'channel_content', 'teleflash', 'worker')
+FAST_PATH_MODULES = ('cli', 'db.engine')
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def cmd_ingest(args):
+    from channel_content import channels_list
+
+    if args.queue:
+        from worker import run_queued_ingest as harvest
+    else:
+        from channel_content import download_channel as harvest
+    failed = harvest(channels_list)
+    if failed:
+        print(f"{len(failed)} channels failed: {', '.join(failed)}")
+    return 0
+
+
+def cmd_report(args):
+    if args.repost:
+        from db.engine import get_engine
+        from report_profiles import load_profiles
+        from teleflash import repost_reports
+
+        repost_reports(get_engine(), load_profiles(), args.repost)
+        return 0
+
+    from pipeline import run_daily_pipeline
+
+    return 0 if run_daily_pipeline(ingest=args.ingest).ok else 1
+
+
+def cmd_backfill(args):
+    from backfill import checkpoint_name, reset_checkpoint, run_backfill
+    from db.engine import get_engine
+    from embeddings import embedder_name
+
+    engine = get_engine()
+    if args.reset:
+        reset_checkpoint(engine, checkpoint_name(embedder_name(args.embedder)))
+    options = {'batch_size': args.batch_size, 'workers': args.workers, 'max_rows': args.max_rows}
+    run_backfill(engine, args.embedder, **{k: v for k, v in options.items() if v is not None})
+    return 0
+
+
+def cmd_status(args):
+    # plain SQL: db.models would pull in pgvector and the embedders
+    from sqlalchemy import text
+    from db.engine import get_engine
+
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+            if args.check:
+                return 0
+            last_ingest = conn.execute(text("SELECT MAX(ingested_at) FROM post_texts")).scalar()
+            watermarks = conn.execute(text("SELECT name, ingested_at FROM report_watermarks ORDER BY name")).all()
+            jobs = conn.execute(text("SELECT status, COUNT(*) FROM channel_jobs GROUP BY status ORDER BY status")).all()
+    except Exception as e:
+        print(f"Database unavailable: {e}")
+        return 1
+
+    print(f"Last post ingested: {last_ingest}")
+    for name, ingested_at in watermarks:
+        print(f"Report {name}: processed up to {ingested_at}")
+    if jobs:
+        print("Channel jobs: " + ", ".join(f"{status} {count}" for status, count in jobs))
+    return 0
+
+
+def import_time(module, repeat=3):
+    """
+    Seconds a fresh interpreter needs to import `module`, best of `repeat` runs
+    :param module: module name, or several separated by commas to import them together
+    :return: seconds, None when the import fails
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', f'import {module}' if module else 'pass'],
+                                cwd=PROJECT_DIR, capture_output=True)
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def cmd_bench(args):
+    interpreter = import_time(None)
+    print(f"{'interpreter start':20} {interpreter:6.3f}s")
+
+    for module in BENCH_MODULES:
+        seconds = import_time(module)
+        if seconds is None:
+            print(f"{module:20}  import failed")
+            continue
+        print(f"{module:20} {seconds - interpreter:6.3f}s")
+
+    # the budget covers the fast path as one process loads it: every module together
+    seconds = import_time(', '.join(FAST_PATH_MODULES))
+    if seconds is None:
+        print(f"fast path ({', '.join(FAST_PATH_MODULES)}): import failed")
+        return 1
+    fast_path = seconds - interpreter
+    print(f"fast path ({', '.join(FAST_PATH_MODULES)}): {fast_path:.3f}s, budget {CLI_IMPORT_BUDGET:.3f}s")
+    return 0 if fast_path <= CLI_IMPORT_BUDGET else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='teleflash', description="TeleFlash command line")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="store the new posts of every channel")
+    ingest.add_argument('--queue', action='store_true', help="through the channel_jobs queue (see worker.py)")
+    ingest.set_defaults(func=cmd_ingest)
+
+    report = commands.add_parser('report', help="summarize the posts of every report profile and post to Slack")
+    report.add_argument('--ingest', action='store_true', help="store the new posts first (the full pipeline)")
+    report.add_argument('--repost', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help="post the reports stored for this date again")
+    report.set_defaults(func=cmd_report)
+
+    backfill = commands.add_parser('backfill', help="embed stored posts that have no embedding yet")
+    backfill.add_argument('--embedder', help="hashing or sentence-transformers, defaults to EMBEDDER")
+    backfill.add_argument('--batch-size', type=int)
+    backfill.add_argument('--workers', type=int)
+    backfill.add_argument('--max-rows', type=int)
+    backfill.add_argument('--reset', action='store_true', help="forget the checkpoint and start over")
+    backfill.set_defaults(func=cmd_backfill)
+
+    status = commands.add_parser('status', help="database, report watermarks and job queue")
+    status.add_argument('--check', action='store_true', help="only test the database connection (exit code)")
+    status.set_defaults(func=cmd_status)
+
+    bench = commands.add_parser('bench', help="import times of the entry points, fails above CLI_IMPORT_BUDGET")
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command != 'bench':
+        import logging
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
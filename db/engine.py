@@ -0,0 +1,32 @@
+import os
+import threading
+
+from sqlalchemy import create_engine
+
+# connections kept open per process; every stage of a pipeline run borrows from the same pool
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+
+
+def connection_string():
+    """
+    PostgreSQL URL from DB_USER, DB_PASSWORD, DB_HOST, DB_PORT (default 5432) and DB_NAME
+    """
+    return (f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+            f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME')}")
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Process-wide engine, created on first use
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(connection_string(), pool_size=DB_POOL_SIZE,
+                                    max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True)
+        return _engine
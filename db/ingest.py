@@ -0,0 +1,133 @@
+from sqlalchemy import func, literal_column, or_, update
+from sqlalchemy.dialects.postgresql import insert
+
+from db.models import Channel, ChannelAccessHash, PostEntity, PostText
+from db.rows import FULL_CHANNEL_FIELDS, POST_ENTITY_FIELDS, POST_TEXT_EMBEDDING_FIELDS
+
+# rows per INSERT statement, keeps the bind parameters well under PostgreSQL's limit
+CHUNK_SIZE = 1000
+
+CHANNEL_UPDATE_COLUMNS = (
+    'title', 'username', 'about', 'participants_count', 'date', 'fake', 'pts', 'pinned_msg_id', 'linked_chat_id',
+    'access_hash', 'resolved_at'
+)
+POST_TEXT_UPDATE_COLUMNS = ('message', 'views', 'forwards', 'edit_date')
+
+
+def _empty_counts():
+    return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+
+def _as_dicts(rows, fields):
+    """
+    Accept row tuples from db.rows as well as dicts
+    """
+    return [row if isinstance(row, dict) else dict(zip(fields, row)) for row in rows]
+
+
+def _dedupe(rows, key_columns):
+    """
+    Keep the last row for every key, ON CONFLICT cannot touch one row twice in a statement
+    """
+    return list({tuple(row[c] for c in key_columns): row for row in rows}.values())
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def upsert_rows(conn, model, rows, key_columns, update_columns=()):
+    """
+    Insert `rows` into the model table, updating the rows whose key already exists.
+
+    Existing rows are only rewritten when one of `update_columns` actually changed,
+    without `update_columns` they are left untouched.
+    :param conn: connection inside a transaction
+    :param model: declarative model (Channel, PostText, ...)
+    :param rows: list of dicts keyed by column name
+    :param key_columns: columns of the unique constraint used as conflict target
+    :param update_columns: columns refreshed on conflict
+    :return: dict with inserted, updated and unchanged counts
+    """
+    counts = _empty_counts()
+    rows = _dedupe(rows, key_columns)
+    table = model.__table__
+
+    for chunk in _chunks(rows):
+        stmt = insert(table).values(chunk)
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key_columns),
+                set_={c: stmt.excluded[c] for c in update_columns},
+                where=or_(*[table.c[c].is_distinct_from(stmt.excluded[c]) for c in update_columns])
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+
+        # xmax is 0 only for freshly inserted tuples, skipped rows are not returned at all
+        inserted = conn.execute(stmt.returning(literal_column('xmax = 0'))).scalars().all()
+
+        counts['inserted'] += sum(1 for i in inserted if i)
+        counts['updated'] += sum(1 for i in inserted if not i)
+        counts['unchanged'] += len(chunk) - len(inserted)
+
+    return counts
+
+
+def upsert_channels(conn, rows, update=True):
+    """
+    Upsert channel rows
+    :param rows: dicts with Channel columns, or CHANNEL_FIELDS / FULL_CHANNEL_FIELDS tuples
+    :param update: refresh existing channels, otherwise only insert missing ones
+    """
+    # CHANNEL_FIELDS is a prefix of FULL_CHANNEL_FIELDS, zip stops at the shorter one
+    rows = [row for row in _as_dicts(rows, FULL_CHANNEL_FIELDS) if row.get('username') is not None]
+    update_columns = [c for c in CHANNEL_UPDATE_COLUMNS if rows and c in rows[0]] if update else ()
+    return upsert_rows(conn, Channel, rows, ('id',), update_columns)
+
+
+def upsert_access_hashes(conn, rows):
+    """
+    Upsert channel_access_hashes rows
+    :param rows: dicts with channel_id, account, access_hash and resolved_at
+    """
+    return upsert_rows(conn, ChannelAccessHash, rows, ('channel_id', 'account'), ('access_hash', 'resolved_at'))
+
+
+def upsert_post_texts(conn, rows):
+    """
+    Upsert post_texts rows, refreshing message, views, forwards, edit date and, when given, the embedding
+    :param rows: dicts, POST_TEXT_FIELDS or POST_TEXT_EMBEDDING_FIELDS tuples
+    """
+    # POST_TEXT_FIELDS is a prefix of POST_TEXT_EMBEDDING_FIELDS, zip stops at the shorter one
+    rows = _as_dicts(rows, POST_TEXT_EMBEDDING_FIELDS)
+    update_columns = POST_TEXT_UPDATE_COLUMNS + (('embedding',) if rows and 'embedding' in rows[0] else ())
+    return upsert_rows(conn, PostText, rows, ('peer_id', 'id', 'date'), update_columns)
+
+
+def insert_post_entities(conn, rows):
+    """
+    Insert post_entities rows, skipping the ones already stored
+    :param rows: dicts or POST_ENTITY_FIELDS tuples
+    """
+    counts = _empty_counts()
+    rows = _as_dicts(rows, POST_ENTITY_FIELDS)
+    for chunk in _chunks(rows):
+        stmt = insert(PostEntity.__table__).values(chunk).on_conflict_do_nothing()
+        inserted = conn.execute(stmt.returning(literal_column('1'))).scalars().all()
+        counts['inserted'] += len(inserted)
+        counts['unchanged'] += len(chunk) - len(inserted)
+
+    return counts
+
+
+def advance_last_seen_msg_id(conn, channel_id, msg_id):
+    """
+    Move the channel's fetch cursor forward, never backwards
+    """
+    conn.execute(
+        update(Channel.__table__)
+        .where(Channel.id == channel_id)
+        .values(last_seen_msg_id=func.greatest(func.coalesce(Channel.last_seen_msg_id, 0), msg_id))
+    )
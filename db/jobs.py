@@ -0,0 +1,107 @@
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from db.models import ChannelJob
+
+# seconds a worker may hold a job; a crashed worker's jobs are claimed again afterwards
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 900))
+# claims of a job before it is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+
+# concurrent claimers skip each other's locked rows instead of waiting for them
+_CLAIM_JOBS = text("""
+    UPDATE channel_jobs
+    SET status = 'running', worker = :worker, claimed_at = now(), attempts = attempts + 1
+    WHERE channel IN (
+        SELECT channel
+        FROM channel_jobs
+        WHERE (status = 'pending'
+               OR (status = 'running' AND claimed_at < now() - make_interval(secs => :lease)))
+          AND attempts < :max_attempts
+        ORDER BY enqueued_at, channel
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING channel
+""")
+
+_EXPIRE_JOBS = text("""
+    UPDATE channel_jobs
+    SET status = 'failed', finished_at = now(), error = 'lease expired'
+    WHERE status = 'running'
+      AND claimed_at < now() - make_interval(secs => :lease)
+      AND attempts >= :max_attempts
+""")
+
+_FINISH_JOB = text("""
+    UPDATE channel_jobs
+    SET status = CASE WHEN :ok THEN 'done' WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+        finished_at = now(),
+        error = :error
+    WHERE channel = :channel AND worker = :worker AND status = 'running'
+""")
+
+
+def enqueue_channels(conn, channels):
+    """
+    Queue one ingest job per channel; jobs still running keep going and are not queued twice
+    :param conn: connection inside a transaction
+    :return: number of jobs (re)queued
+    """
+    if not channels:
+        return 0
+    table = ChannelJob.__table__
+    now = datetime.now(timezone.utc)
+    rows = [{'channel': channel, 'status': 'pending', 'attempts': 0, 'enqueued_at': now}
+            for channel in dict.fromkeys(channels)]
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['channel'],
+        set_={'status': 'pending', 'attempts': 0, 'worker': None, 'claimed_at': None,
+              'enqueued_at': stmt.excluded.enqueued_at, 'finished_at': None, 'error': None},
+        where=table.c.status != 'running'
+    )
+    return conn.execute(stmt).rowcount
+
+
+def claim_jobs(conn, worker, limit, lease=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Take up to `limit` pending jobs (or jobs whose lease expired) for `worker`
+    :param conn: connection inside a transaction, commit it to hand the jobs over
+    :return: channel usernames
+    """
+    params = {'lease': lease, 'max_attempts': max_attempts}
+    conn.execute(_EXPIRE_JOBS, params)
+    return conn.execute(_CLAIM_JOBS, {**params, 'worker': worker, 'limit': limit}).scalars().all()
+
+
+def finish_job(conn, channel, worker, error=None, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Mark a claimed job done, or on `error` pending again (failed after `max_attempts` claims).
+    A job whose lease expired and was claimed by another worker is left alone.
+    """
+    conn.execute(_FINISH_JOB, {
+        'ok': error is None, 'max_attempts': max_attempts, 'error': error,
+        'channel': channel, 'worker': worker
+    })
+
+
+def queue_counts(conn):
+    """
+    :return: {status: number of jobs}
+    """
+    rows = conn.execute(text("SELECT status, COUNT(*) FROM channel_jobs GROUP BY status"))
+    return {status: count for status, count in rows}
+
+
+def unfinished_channels(conn, channels):
+    """
+    :return: the channels among `channels` whose job is not done
+    """
+    return conn.execute(
+        text("SELECT channel FROM channel_jobs WHERE status <> 'done' AND channel = ANY(:channels)"),
+        {"channels": list(channels)}
+    ).scalars().all()
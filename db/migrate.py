@@ -0,0 +1,61 @@
+import logging
+import os
+from glob import glob
+
+from sqlalchemy import text
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def apply_migrations(engine, directory=MIGRATIONS_DIR):
+    """
+    Apply the numbered SQL files in `directory` that were not applied yet.
+    Every file runs in its own transaction and is recorded in `schema_migrations`.
+    :param engine: SQLAlchemy engine
+    :param directory: folder with `NNN_description.sql` files
+    :return: list of applied versions
+    """
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """))
+        done = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    applied = []
+    for path in sorted(glob(os.path.join(directory, '*.sql'))):
+        version = os.path.splitext(os.path.basename(path))[0]
+        if version in done:
+            continue
+
+        with open(path, encoding='utf-8') as f:
+            sql = f.read()
+
+        logging.info(f"Applying migration {version}")
+        with engine.begin() as conn:
+            # raw DBAPI cursor: migration files may contain `%` and several statements
+            cursor = conn.connection.cursor()
+            cursor.execute(sql)
+            cursor.close()
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+        applied.append(version)
+
+    return applied
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    from db.engine import get_engine
+    from db.models import Base
+    from db.partitions import maintain_partitions
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    maintain_partitions(engine)
@@ -0,0 +1,9 @@
+-- Per-channel high-water mark used as `min_id` for incremental fetching
+ALTER TABLE channels ADD COLUMN IF NOT EXISTS last_seen_msg_id INTEGER;
+
+-- Seed the cursor from posts that are already stored
+UPDATE channels c
+SET last_seen_msg_id = p.max_id
+FROM (SELECT peer_id, MAX(id) AS max_id FROM post_texts GROUP BY peer_id) p
+WHERE c.id = p.peer_id
+  AND c.last_seen_msg_id IS NULL;
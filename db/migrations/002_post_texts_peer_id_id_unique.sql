@@ -0,0 +1,12 @@
+-- Conflict target for INSERT ... ON CONFLICT (peer_id, id) in db.ingest.
+-- Only needed while post_texts is keyed on id alone: a table created by db.models is already
+-- partitioned and keyed on (peer_id, id, date), and a partitioned table cannot have a unique
+-- constraint without its partition key.
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'post_texts'::regclass) = 'r'
+       AND (SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conname = 'post_texts_pkey') = 'PRIMARY KEY (id)'
+       AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_post_texts_peer_id_id') THEN
+        ALTER TABLE post_texts ADD CONSTRAINT uq_post_texts_peer_id_id UNIQUE (peer_id, id);
+    END IF;
+END $$;
@@ -0,0 +1,3 @@
+-- Cached username -> (id, access_hash) resolution
+ALTER TABLE channels ADD COLUMN IF NOT EXISTS access_hash BIGINT;
+ALTER TABLE channels ADD COLUMN IF NOT EXISTS resolved_at TIMESTAMPTZ;
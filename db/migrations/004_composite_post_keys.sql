@@ -0,0 +1,25 @@
+-- Telegram message ids are only unique per channel: key posts on (peer_id, id)
+DO $$
+BEGIN
+    IF (SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conname = 'post_texts_pkey') = 'PRIMARY KEY (id)' THEN
+        ALTER TABLE summary_sources DROP CONSTRAINT IF EXISTS summary_sources_post_id_fkey;
+
+        ALTER TABLE post_texts DROP CONSTRAINT post_texts_pkey;
+        ALTER TABLE post_texts ADD CONSTRAINT post_texts_pkey PRIMARY KEY (peer_id, id);
+        -- the primary key is now the upsert conflict target
+        ALTER TABLE post_texts DROP CONSTRAINT IF EXISTS uq_post_texts_peer_id_id;
+
+        ALTER TABLE summary_sources ADD CONSTRAINT summary_sources_peer_id_post_id_fkey
+            FOREIGN KEY (peer_id, post_id) REFERENCES post_texts (peer_id, id);
+    END IF;
+
+    IF (SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conname = 'post_entities_pkey') = 'PRIMARY KEY (id)' THEN
+        ALTER TABLE post_entities DROP CONSTRAINT post_entities_pkey;
+        DELETE FROM post_entities WHERE entities IS NULL;
+        ALTER TABLE post_entities ALTER COLUMN entities SET NOT NULL;
+        ALTER TABLE post_entities ADD CONSTRAINT post_entities_pkey PRIMARY KEY (peer_id, id, entities);
+    END IF;
+END $$;
+
+-- per-channel date range scans (joins on peer_id filtered on date)
+CREATE INDEX IF NOT EXISTS ix_post_texts_peer_id_date ON post_texts (peer_id, date);
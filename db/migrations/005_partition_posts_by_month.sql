@@ -0,0 +1,77 @@
+-- Range-partition post_texts and post_entities by month on `date`.
+-- Existing rows are copied into monthly partitions covering their dates;
+-- db.partitions creates the future ones and applies the retention policy.
+DO $$
+DECLARE
+    tbl TEXT;
+    first_month DATE;
+    last_month DATE;
+    m DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'post_texts'::regclass) = 'r' THEN
+        -- a foreign key into a partitioned table would block detaching old partitions
+        ALTER TABLE summary_sources DROP CONSTRAINT IF EXISTS summary_sources_peer_id_post_id_fkey;
+
+        ALTER TABLE post_texts RENAME TO post_texts_unpartitioned;
+        ALTER TABLE post_texts_unpartitioned RENAME CONSTRAINT post_texts_pkey TO post_texts_unpartitioned_pkey;
+        CREATE TABLE post_texts (LIKE post_texts_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (date);
+        -- message ids come from Telegram; the SERIAL default copied from the old table would
+        -- keep its sequence, owned by post_texts_unpartitioned, from being dropped with it
+        ALTER TABLE post_texts ALTER COLUMN id DROP DEFAULT;
+        ALTER TABLE post_texts ADD CONSTRAINT post_texts_pkey PRIMARY KEY (peer_id, id, date);
+        ALTER TABLE post_texts ADD CONSTRAINT post_texts_peer_id_fkey FOREIGN KEY (peer_id) REFERENCES channels (id);
+    END IF;
+
+    IF (SELECT relkind FROM pg_class WHERE oid = 'post_entities'::regclass) = 'r' THEN
+        ALTER TABLE post_entities RENAME TO post_entities_unpartitioned;
+        ALTER TABLE post_entities_unpartitioned RENAME CONSTRAINT post_entities_pkey TO post_entities_unpartitioned_pkey;
+        ALTER TABLE post_entities_unpartitioned ADD COLUMN IF NOT EXISTS date DATE;
+        UPDATE post_entities_unpartitioned pe
+        SET date = pt.date
+        FROM post_texts_unpartitioned pt
+        WHERE pt.peer_id = pe.peer_id AND pt.id = pe.id;
+        -- links of posts that were never stored as text
+        UPDATE post_entities_unpartitioned SET date = CURRENT_DATE WHERE date IS NULL;
+
+        CREATE TABLE post_entities (
+            id INTEGER NOT NULL,
+            peer_id INTEGER NOT NULL REFERENCES channels (id),
+            date DATE NOT NULL,
+            entities TEXT NOT NULL,
+            CONSTRAINT post_entities_pkey PRIMARY KEY (peer_id, id, date, entities)
+        ) PARTITION BY RANGE (date);
+    END IF;
+
+    FOREACH tbl IN ARRAY ARRAY['post_texts', 'post_entities'] LOOP
+        IF to_regclass(tbl || '_unpartitioned') IS NULL THEN
+            CONTINUE;
+        END IF;
+
+        EXECUTE format('SELECT date_trunc(''month'', MIN(date))::date, date_trunc(''month'', MAX(date))::date FROM %I',
+                       tbl || '_unpartitioned')
+            INTO first_month, last_month;
+        first_month := COALESCE(first_month, date_trunc('month', CURRENT_DATE)::date);
+        last_month := GREATEST(COALESCE(last_month, first_month), date_trunc('month', CURRENT_DATE)::date);
+
+        m := first_month;
+        WHILE m <= last_month LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           tbl || '_y' || to_char(m, 'YYYY') || 'm' || to_char(m, 'MM'), tbl,
+                           m, (m + INTERVAL '1 month')::date);
+            m := (m + INTERVAL '1 month')::date;
+        END LOOP;
+
+        IF tbl = 'post_texts' THEN
+            INSERT INTO post_texts SELECT * FROM post_texts_unpartitioned;
+        ELSE
+            INSERT INTO post_entities (id, peer_id, date, entities)
+            SELECT id, peer_id, date, entities FROM post_entities_unpartitioned;
+        END IF;
+
+        EXECUTE format('DROP TABLE %I', tbl || '_unpartitioned');
+    END LOOP;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_post_texts_date ON post_texts (date);
+CREATE INDEX IF NOT EXISTS ix_post_texts_peer_id_date ON post_texts (peer_id, date);
+CREATE INDEX IF NOT EXISTS ix_post_entities_peer_id ON post_entities (peer_id);
@@ -0,0 +1,3 @@
+-- Trigram index for case-insensitive regex keyword filtering in the database
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_post_texts_message_trgm ON post_texts USING gin (message gin_trgm_ops);
@@ -0,0 +1,5 @@
+-- Embedding column for semantic retrieval and its HNSW index (cosine distance)
+CREATE EXTENSION IF NOT EXISTS vector;
+ALTER TABLE post_texts ADD COLUMN IF NOT EXISTS embedding vector(384);
+CREATE INDEX IF NOT EXISTS ix_post_texts_embedding_hnsw ON post_texts
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
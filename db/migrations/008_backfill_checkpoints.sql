@@ -0,0 +1,9 @@
+-- Resumable position of backfill jobs (backfill.py)
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    name VARCHAR(255) PRIMARY KEY,
+    peer_id INTEGER,
+    post_id INTEGER,
+    date DATE,
+    rows_done BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL
+);
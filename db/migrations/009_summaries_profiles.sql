@@ -0,0 +1,7 @@
+-- Stored reports: profile, Finnish version and the posts each summary covers
+ALTER TABLE summaries ADD COLUMN IF NOT EXISTS profile VARCHAR(255);
+ALTER TABLE summaries ADD COLUMN IF NOT EXISTS summary_fi TEXT;
+ALTER TABLE summaries ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ;
+ALTER TABLE summaries ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE summaries ADD COLUMN IF NOT EXISTS covered_msg_ids JSONB;
+CREATE INDEX IF NOT EXISTS ix_summaries_profile_date ON summaries (profile, date);
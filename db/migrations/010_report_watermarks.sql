@@ -0,0 +1,15 @@
+-- Ingestion time of every post and the per-report processing watermarks (teleflash.py)
+ALTER TABLE post_texts ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMPTZ;
+-- only rows stored from now on get the default, the existing ones are not rewritten
+ALTER TABLE post_texts ALTER COLUMN ingested_at SET DEFAULT clock_timestamp();
+-- The posts the last 24 hours report would have covered are stamped with the migration time,
+-- so the first watermark-based run reports them. Older rows stay NULL and are in no window.
+UPDATE post_texts SET ingested_at = now()
+WHERE ingested_at IS NULL AND date >= now() - INTERVAL '24 hours';
+CREATE INDEX IF NOT EXISTS ix_post_texts_ingested_at ON post_texts (ingested_at);
+
+CREATE TABLE IF NOT EXISTS report_watermarks (
+    name VARCHAR(255) PRIMARY KEY,
+    ingested_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL
+);
@@ -0,0 +1,12 @@
+-- Work queue of per-channel ingest jobs (worker.py)
+CREATE TABLE IF NOT EXISTS channel_jobs (
+    channel VARCHAR(255) PRIMARY KEY,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker VARCHAR(255),
+    claimed_at TIMESTAMPTZ,
+    enqueued_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_channel_jobs_status_enqueued_at ON channel_jobs (status, enqueued_at);
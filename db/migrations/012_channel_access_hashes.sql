@@ -0,0 +1,9 @@
+-- Username resolutions per Telegram account: access hashes are only valid for the account
+-- they were issued to. channels.access_hash stays as a fallback, refreshed before use.
+CREATE TABLE IF NOT EXISTS channel_access_hashes (
+    channel_id INTEGER NOT NULL REFERENCES channels (id),
+    account BIGINT NOT NULL,
+    access_hash BIGINT NOT NULL,
+    resolved_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (channel_id, account)
+);
@@ -1,12 +1,21 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, Date, Boolean, Float, ForeignKey, Index
+    Column, Integer, BigInteger, String, Text, Date, DateTime, Boolean, Float, ForeignKey, Index, PrimaryKeyConstraint,
+    DDL, event, text
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
 
+from embeddings import EMBEDDING_DIM
+
 Base = declarative_base()
 
+# extensions the schema depends on, created before the tables
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS vector"))
+
+
 class Channel(Base):
     __tablename__ = "channels"
 
@@ -20,6 +29,12 @@ class Channel(Base):
     participants_count = Column(Integer, nullable=False, default=0)
     pinned_msg_id = Column(Integer, nullable=True)
     linked_chat_id = Column(Integer, nullable=True)
+    # highest message id stored, used as `min_id` for the next fetch
+    last_seen_msg_id = Column(Integer, nullable=True)
+    # username resolution of a single account, from before channel_access_hashes;
+    # only used, refreshed first, by accounts without their own resolution
+    access_hash = Column(BigInteger, nullable=True)
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
 
     # Add index for faster search on frequently queried columns
     __table_args__ = (
@@ -30,23 +45,52 @@ class Channel(Base):
 class PostText(Base):
     __tablename__ = "post_texts"
 
-    id = Column(Integer, primary_key=True)
+    # message ids are only unique within a channel
+    id = Column(Integer, nullable=False)
     peer_id = Column(Integer, ForeignKey("channels.id"), nullable=False)
     date = Column(Date, nullable=False)
     message = Column(Text, nullable=True)
     views = Column(Integer, nullable=False, default=0)
     forwards = Column(Integer, nullable=False, default=0)
     edit_date = Column(Date, nullable=True)
-    #embedding = Column(Vector(384), nullable=True)
+    # filled at ingest time by the embedder selected with EMBEDDER, NULL when disabled
+    embedding = Column(Vector(EMBEDDING_DIM), nullable=True)
+    # when the row was first stored, reports process the posts ingested since their watermark;
+    # clock_timestamp() rather than now(): a long transaction must not stamp rows in the past
+    ingested_at = Column(DateTime(timezone=True), nullable=True, server_default=text("clock_timestamp()"))
 
     # Establish relationship with Channel for easier ORM navigation
     channel = relationship("Channel", back_populates="posts")
 
+    # monthly range partitions, managed by db.partitions; the partition key
+    # has to be part of the primary key
     __table_args__ = (
+        PrimaryKeyConstraint("peer_id", "id", "date", name="post_texts_pkey"),
         Index("ix_post_texts_date", "date"),
+        Index("ix_post_texts_peer_id_date", "peer_id", "date"),
+        Index("ix_post_texts_ingested_at", "ingested_at"),
+        # serves the keyword regex pushed down by teleflash.fetch_data_for_specific_channels
+        Index("ix_post_texts_message_trgm", "message", postgresql_using="gin",
+              postgresql_ops={"message": "gin_trgm_ops"}),
+        # nearest-neighbour search by cosine distance, see teleflash.fetch_similar_posts
+        Index("ix_post_texts_embedding_hnsw", "embedding", postgresql_using="hnsw",
+              postgresql_with={"m": 16, "ef_construction": 64},
+              postgresql_ops={"embedding": "vector_cosine_ops"}),
+        {"postgresql_partition_by": "RANGE (date)"},
     )
 
 
+class ChannelAccessHash(Base):
+    __tablename__ = "channel_access_hashes"
+
+    # cached username resolution, refreshed in batches with GetChannelsRequest; access hashes
+    # are issued per Telegram account, so every account (its user id) keeps its own
+    channel_id = Column(Integer, ForeignKey("channels.id"), primary_key=True)
+    account = Column(BigInteger, primary_key=True)
+    access_hash = Column(BigInteger, nullable=False)
+    resolved_at = Column(DateTime(timezone=True), nullable=False)
+
+
 Channel.posts = relationship("PostText", order_by=PostText.date, back_populates="channel")
 
 
@@ -56,6 +100,17 @@ class Summary(Base):
     id = Column(Integer, primary_key=True)
     summary = Column(Text, nullable=False)
     date = Column(Date, nullable=False)
+    # report profile (report_profiles.ReportProfile.name) and the Finnish version of the summary
+    profile = Column(String(255), nullable=True)
+    summary_fi = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    # highest message id summarized per channel ({"peer_id": msg_id}), rolling summaries start after it
+    covered_msg_ids = Column(JSONB, nullable=True)
+
+    __table_args__ = (
+        Index("ix_summaries_profile_date", "profile", "date"),
+    )
 
 
 class SummarySource(Base):
@@ -63,13 +118,19 @@ class SummarySource(Base):
 
     id = Column(Integer, primary_key=True)
     summary_id = Column(Integer, ForeignKey("summaries.id"), nullable=False)
-    post_id = Column(Integer, ForeignKey("post_texts.id"), nullable=False)
+    post_id = Column(Integer, nullable=False)
     peer_id = Column(Integer, ForeignKey("channels.id"), nullable=False)
     source = Column(Text, nullable=False)
 
     # Relationships to facilitate joins and ensure data integrity
     summary = relationship("Summary", back_populates="sources")
-    post = relationship("PostText")
+    # no foreign key to post_texts: summaries outlive posts whose partition was detached
+    post = relationship(
+        "PostText",
+        primaryjoin="and_(PostText.peer_id == foreign(SummarySource.peer_id), "
+                    "PostText.id == foreign(SummarySource.post_id))",
+        viewonly=True
+    )
     channel = relationship("Channel")
 
     __table_args__ = (
@@ -84,17 +145,63 @@ Summary.sources = relationship("SummarySource", order_by=SummarySource.id, back_
 class PostEntity(Base):
     __tablename__ = "post_entities"
 
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, nullable=False)
     peer_id = Column(Integer, ForeignKey("channels.id"), nullable=False)
-    entities = Column(Text, nullable=True)
+    # date of the post, partition key
+    date = Column(Date, nullable=False)
+    # one row per link of a post
+    entities = Column(Text, nullable=False)
 
     channel = relationship("Channel")
 
     __table_args__ = (
+        PrimaryKeyConstraint("peer_id", "id", "date", "entities", name="post_entities_pkey"),
         Index("ix_post_entities_peer_id", "peer_id"),
+        {"postgresql_partition_by": "RANGE (date)"},
     )
 
 
+
+class BackfillCheckpoint(Base):
+    __tablename__ = "backfill_checkpoints"
+
+    # one row per backfill job, e.g. "embedding:hashing"
+    name = Column(String(255), primary_key=True)
+    # post_texts key of the last row handled, the next batch starts after it
+    peer_id = Column(Integer, nullable=True)
+    post_id = Column(Integer, nullable=True)
+    date = Column(Date, nullable=True)
+    rows_done = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+class ReportWatermark(Base):
+    __tablename__ = "report_watermarks"
+
+    # report profile name (report_profiles.ReportProfile.name)
+    name = Column(String(255), primary_key=True)
+    # posts with post_texts.ingested_at before this were reported, the next run starts here
+    ingested_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+class ChannelJob(Base):
+    __tablename__ = "channel_jobs"
+
+    # one job per channel username, enqueuing again resets it to pending
+    channel = Column(String(255), primary_key=True)
+    # pending, running, done or failed
+    status = Column(String(16), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    # worker holding the job and when it claimed it; a running job past its lease is claimed again
+    worker = Column(String(255), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    enqueued_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_channel_jobs_status_enqueued_at", "status", "enqueued_at"),
+    )
+
 if __name__ == "__main__":
     from sqlalchemy import create_engine
     from dotenv import load_dotenv
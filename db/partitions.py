@@ -0,0 +1,161 @@
+import logging
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+# tables range-partitioned by month on their `date` column
+PARTITIONED_TABLES = ('post_texts', 'post_entities')
+
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+# 0 keeps every partition
+PARTITION_RETENTION_MONTHS = int(os.getenv('PARTITION_RETENTION_MONTHS', 0))
+# 'detach' keeps old partitions as standalone tables, 'drop' deletes them
+PARTITION_RETENTION_MODE = os.getenv('PARTITION_RETENTION_MODE', 'detach')
+
+_PARTITION_NAME = re.compile(r'_y(\d{4})m(\d{2})$')
+
+# months known to have partitions in this process
+_known_months = set()
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f'{table}_y{month.year:04d}m{month.month:02d}'
+
+
+def archive_name(conn, name: str) -> str:
+    """
+    First free name for a detached partition: `name`_archived, `name`_archived2, ...
+    """
+    candidate, n = f'{name}_archived', 1
+    while conn.execute(text("SELECT to_regclass(:name)"), {"name": candidate}).scalar() is not None:
+        n += 1
+        candidate = f'{name}_archived{n}'
+    return candidate
+
+
+def detach_partition(conn, table: str, name: str) -> str:
+    """
+    Detach a partition and rename it, so that its month can get a new partition
+    :return: new name of the standalone table
+    """
+    archived = archive_name(conn, name)
+    conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+    conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{archived}"'))
+    return archived
+
+
+def create_partitions(conn, months, tables=PARTITIONED_TABLES) -> list:
+    """
+    Create the monthly partitions that do not exist yet
+    :param conn: connection inside a transaction
+    :param months: first days of the months to cover
+    :return: names of the created partitions
+    """
+    created = []
+    for table in tables:
+        attached = set(list_partitions(conn, table))
+        for month in sorted(set(months)):
+            name = partition_name(table, month)
+            if name in attached:
+                continue
+            if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+                # detached under its partition name, before detached partitions were renamed
+                archived = archive_name(conn, name)
+                conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{archived}"'))
+                logging.info(f"Renamed detached partition {name} to {archived}")
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+
+    if created:
+        logging.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def ensure_partitions_for(engine, dates) -> None:
+    """
+    Make sure rows with these dates have a partition to go to. Runs in its own
+    short transaction, before the data is written, and only for months this
+    process has not seen yet.
+    """
+    months = {month_start(d) for d in dates} - _known_months
+    if not months:
+        return
+    with engine.begin() as conn:
+        create_partitions(conn, months)
+    _known_months.update(months)
+
+
+def list_partitions(conn, table: str) -> dict:
+    """
+    Monthly partitions of `table`
+    :return: dict partition name -> first day of its month
+    """
+    rows = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+    """), {"table": table}).scalars().all()
+
+    partitions = {}
+    for name in rows:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def apply_retention(conn, keep_months=PARTITION_RETENTION_MONTHS, mode=PARTITION_RETENTION_MODE,
+                    today=None) -> list:
+    """
+    Detach or drop the partitions older than `keep_months` months. Detached partitions
+    are renamed with an `_archived` suffix, a later row of their month gets a new partition.
+    :return: names of the dropped partitions, or the new names of the detached ones
+    """
+    if keep_months <= 0:
+        return []
+    if mode not in ('detach', 'drop'):
+        raise ValueError(f"Unknown partition retention mode: {mode}")
+
+    cutoff = add_months(month_start(today or date.today()), -keep_months)
+    removed = []
+    for table in PARTITIONED_TABLES:
+        for name, month in sorted(list_partitions(conn, table).items()):
+            if month >= cutoff:
+                continue
+            if mode == 'detach':
+                removed.append(detach_partition(conn, table, name))
+            else:
+                conn.execute(text(f'DROP TABLE "{name}"'))
+                removed.append(name)
+            _known_months.discard(month)
+
+    if removed:
+        logging.info(f"Retention ({mode}, {keep_months} months): {', '.join(removed)}")
+    return removed
+
+
+def maintain_partitions(engine, months_ahead=PARTITION_MONTHS_AHEAD, today=None) -> None:
+    """
+    Create the current and next `months_ahead` partitions and apply the retention policy
+    """
+    current = month_start(today or date.today())
+    months = [add_months(current, n) for n in range(months_ahead + 1)]
+    with engine.begin() as conn:
+        create_partitions(conn, months)
+        apply_retention(conn, today=today)
+    _known_months.update(months)
@@ -0,0 +1,223 @@
+# Telethon objects -> row tuples for db.ingest, read straight from the attributes
+# instead of going through to_dict() and pandas
+
+from datetime import timezone
+
+from telethon.tl import types
+
+POST_TEXT_FIELDS = ('id', 'peer_id', 'date', 'message', 'views', 'forwards', 'edit_date')
+# post_texts rows extended by with_embeddings
+POST_TEXT_EMBEDDING_FIELDS = POST_TEXT_FIELDS + ('embedding',)
+POST_ENTITY_FIELDS = ('id', 'peer_id', 'date', 'entities')
+CHANNEL_FIELDS = ('id', 'title', 'username', 'date', 'fake')
+FULL_CHANNEL_FIELDS = CHANNEL_FIELDS + ('about', 'participants_count', 'linked_chat_id', 'pts', 'pinned_msg_id')
+
+
+def _peer_channel_id(msg):
+    return getattr(msg.peer_id, 'channel_id', None)
+
+
+def utc_date(value):
+    """
+    UTC calendar date of a message time. Handing PostgreSQL the datetime would convert it
+    in the session TimeZone, the partition key and the report windows rely on UTC dates.
+    """
+    return value.astimezone(timezone.utc).date() if value is not None else None
+
+
+def post_text_row(msg):
+    """
+    post_texts row of a Message, None for service messages and messages without text
+    """
+    if not isinstance(msg, types.Message) or msg.message is None:
+        return None
+    return (
+        msg.id,
+        _peer_channel_id(msg),
+        utc_date(msg.date),
+        msg.message,
+        msg.views or 0,
+        msg.forwards or 0,
+        utc_date(msg.edit_date)
+    )
+
+
+def post_entity_rows(msg):
+    """
+    post_entities rows of a Message, one per hidden link (MessageEntityTextUrl)
+    """
+    if not isinstance(msg, types.Message) or not msg.entities:
+        return []
+    peer_id = _peer_channel_id(msg)
+    day = utc_date(msg.date)
+    return [(msg.id, peer_id, day, e.url) for e in msg.entities if getattr(e, 'url', None)]
+
+
+def channel_row(chat):
+    """
+    channels row of a chat listed next to the messages, None without username
+    """
+    if not getattr(chat, 'username', None):
+        return None
+    return chat.id, chat.title, chat.username, chat.date, chat.fake
+
+
+def full_channel_row(channel_request):
+    """
+    channels row of a GetFullChannelRequest response
+    """
+    full_chat = channel_request.full_chat
+    if full_chat.participants_count is None:
+        return None
+
+    for chat in channel_request.chats:
+        if chat.id == full_chat.id:
+            row = channel_row(chat)
+            if row is None:
+                return None
+            return row + (
+                full_chat.about,
+                full_chat.participants_count,
+                full_chat.linked_chat_id,
+                full_chat.pts,
+                full_chat.pinned_msg_id
+            )
+    return None
+
+
+def normalize_messages(messages):
+    """
+    Split messages into post_texts and post_entities rows in a single pass
+    :return: (post_text rows, post_entity rows)
+    """
+    post_texts, post_entities = [], []
+    for msg in messages:
+        row = post_text_row(msg)
+        if row is not None:
+            post_texts.append(row)
+        post_entities.extend(post_entity_rows(msg))
+    return post_texts, post_entities
+
+
+def with_embeddings(post_texts, embedder):
+    """
+    post_texts rows with the embedding of their message appended (POST_TEXT_EMBEDDING_FIELDS)
+    :param embedder: embeddings.get_embedder() result, rows are returned unchanged for None
+    """
+    if embedder is None or not post_texts:
+        return post_texts
+    # captions of media posts are often blank, their embedding stays NULL
+    texts = [row[3] for row in post_texts if row[3].strip()]
+    vectors = iter(embedder.embed(texts))
+    return [row + (next(vectors) if row[3].strip() else None,) for row in post_texts]
+
+
+def normalize_chats(chats):
+    return [row for row in map(channel_row, chats) if row is not None]
+
+
+def _dataframe_rows(messages):
+    """
+    The former to_dict() + pandas path, kept for the benchmark below
+    """
+    import pandas as pd
+
+    df = pd.DataFrame([msg.to_dict() for msg in messages])
+    df = df.loc[df['_'] == "Message",]
+    df.media = df.media.str['_']
+    df.peer_id = df.peer_id.str['channel_id'].astype('Int64')
+    df.reply_to = df.reply_to.str['reply_to_msg_id'].astype('Int64')
+    if df.replies.isna().mean() < 1:
+        df.replies = df.replies.str['channel_id'].astype('Int64')
+
+    if df.fwd_from.isna().mean() < 1:
+        df['fwd_from_channel_id'] = df.fwd_from.str['from_id'].str['channel_id'].astype('Int64')
+        df['fwd_from_channel_post'] = df.fwd_from.str['channel_post'].astype('Int64')
+
+    df.entities = df.entities.apply(lambda x: [i.get('url') for i in x if i.get('url')])
+
+    df = df.drop(['ttl_period', 'action', 'via_bot_id', 'restriction_reason', 'reply_markup', '_',
+                  'out', 'media_unread', 'silent', 'post', 'pinned', 'from_scheduled', 'fwd_from',
+                  'grouped_id', 'legacy', 'edit_hide', 'mentioned', 'post_author', 'from_id'], axis=1, errors='ignore')
+
+    post_texts = df.loc[df['message'].notnull(), list(POST_TEXT_FIELDS)].reset_index(drop=True)
+    post_entities = df.loc[df['entities'].notnull(), list(POST_ENTITY_FIELDS)].explode('entities')
+    post_entities = post_entities.loc[post_entities['entities'].notnull(), :].reset_index(drop=True)
+    post_texts[['views', 'forwards']] = post_texts[['views', 'forwards']].fillna(0)
+
+    return (
+        list(post_texts.itertuples(index=False, name=None)),
+        list(post_entities.itertuples(index=False, name=None))
+    )
+
+
+def _synthetic_messages(n):
+    from datetime import datetime, timedelta, timezone
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    text = 'Финляндия закрыла границу, сообщает источник. ' * 8
+    messages = []
+    for i in range(n):
+        entities = [types.MessageEntityTextUrl(offset=0, length=9, url=f'https://example.org/{i}')] if i % 3 == 0 else []
+        messages.append(types.Message(
+            id=i + 1,
+            peer_id=types.PeerChannel(channel_id=1000 + i % 50),
+            date=start + timedelta(minutes=i),
+            message=text,
+            views=i * 10,
+            forwards=i % 7,
+            entities=entities,
+            replies=types.MessageReplies(replies=i % 5, replies_pts=i, comments=True, channel_id=2000),
+            fwd_from=types.MessageFwdHeader(
+                date=start, from_id=types.PeerChannel(channel_id=3000), channel_post=i
+            ) if i % 4 == 0 else None
+        ))
+    return messages
+
+
+def _check_midnight_dates():
+    """
+    Posts around midnight UTC are dated by their UTC day, whatever the offset of their timestamp
+    """
+    from datetime import date, datetime, timedelta
+
+    before = datetime(2024, 1, 1, 23, 59, 30, tzinfo=timezone.utc)
+    cases = [
+        (before, date(2024, 1, 1)),
+        (before + timedelta(minutes=1), date(2024, 1, 2)),
+        # the same instant as `before` seen from UTC+3, already 2 January there
+        (before.astimezone(timezone(timedelta(hours=3))), date(2024, 1, 1)),
+    ]
+    for when, expected in cases:
+        msg = types.Message(id=1, peer_id=types.PeerChannel(channel_id=1), date=when, message='x',
+                            entities=[types.MessageEntityTextUrl(offset=0, length=1, url='https://example.org')])
+        assert post_text_row(msg)[2] == expected, (when, post_text_row(msg)[2])
+        assert post_entity_rows(msg)[0][2] == expected
+    print("midnight posts dated by their UTC day")
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m db.rows [messages]
+    import sys
+    import time
+    import tracemalloc
+
+    _check_midnight_dates()
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    messages = _synthetic_messages(n)
+
+    results = {}
+    for name, fn in (('dataframe', _dataframe_rows), ('normalizer', normalize_messages)):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        results[name] = fn(messages)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>10}: {elapsed / n * 1e6:8.2f} us/message, peak {peak / 2 ** 20:8.2f} MiB")
+
+    texts, entities = results['dataframe']
+    assert [r[0] for r in texts] == [r[0] for r in results['normalizer'][0]]
+    assert [(r[0], r[-1]) for r in entities] == [(r[0], r[-1]) for r in results['normalizer'][1]]
+    print(f"identical rows: {len(texts)} post_texts, {len(entities)} post_entities")
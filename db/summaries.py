@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, text
+
+from db.models import Summary, SummarySource
+
+
+def telegram_url(channel_username, message_id):
+    return f"https://t.me/{channel_username}/{message_id}"
+
+
+def covered_msg_ids(messages, previous=None):
+    """
+    Highest message id per channel among `messages`, merged with a previous coverage
+    :return: {"peer_id": msg_id}, string keys as stored in JSONB
+    """
+    covered = dict(previous or {})
+    for msg in messages:
+        key = str(msg['peer_id'])
+        covered[key] = max(covered.get(key, 0), msg['message_id'])
+    return covered
+
+
+def save_summary(conn, profile, day, summary, summary_fi, messages, cited, covered, message_count):
+    """
+    Store a report and the posts it cites, one statement per table
+    :param conn: connection inside a transaction
+    :param profile: report profile name
+    :param day: report date
+    :param messages: message dicts the summary may cite (with peer_id and channel_username)
+    :param cited: message ids cited by the summary, as strings
+    :param covered: coverage stored for the next rolling summary, see covered_msg_ids
+    :param message_count: posts summarized, including those of the merged earlier summary
+    :return: id of the new summaries row
+    """
+    summary_id = conn.execute(
+        insert(Summary.__table__).values(
+            profile=profile,
+            date=day,
+            summary=summary,
+            summary_fi=summary_fi,
+            created_at=datetime.now(timezone.utc),
+            message_count=message_count,
+            covered_msg_ids=covered,
+        ).returning(Summary.__table__.c.id)
+    ).scalar_one()
+
+    # bare message ids are only unique per channel: every post with a cited id is a source
+    sources = {
+        (msg['peer_id'], msg['message_id']): {
+            'summary_id': summary_id,
+            'post_id': msg['message_id'],
+            'peer_id': msg['peer_id'],
+            'source': telegram_url(msg['channel_username'], msg['message_id']),
+        }
+        for msg in messages if str(msg['message_id']) in cited
+    }
+    if sources:
+        conn.execute(insert(SummarySource.__table__), list(sources.values()))
+    return summary_id
+
+
+def latest_summary(conn, profile, day):
+    """
+    Most recent report of `profile` for `day`, None if there is none
+    """
+    table = Summary.__table__
+    return conn.execute(
+        select(table)
+        .where(table.c.profile == profile, table.c.date == day)
+        .order_by(table.c.created_at.desc(), table.c.id.desc())
+        .limit(1)
+    ).first()
+
+
+def summary_source_messages(conn, summary_id):
+    """
+    The cited posts of a stored report, as message dicts like teleflash.fetch_data_for_specific_channels
+    """
+    rows = conn.execute(text("""
+        SELECT pt.id, pt.message, pt.date, pt.views, pt.forwards, c.title, c.username, pt.peer_id
+        FROM summary_sources ss
+        JOIN post_texts pt ON pt.peer_id = ss.peer_id AND pt.id = ss.post_id
+        JOIN channels c ON c.id = pt.peer_id
+        WHERE ss.summary_id = :summary_id
+        ORDER BY pt.date DESC
+    """), {"summary_id": summary_id}).fetchall()
+    return [{
+        "message_id": row[0],
+        "message": row[1],
+        "date": row[2],
+        "views": row[3],
+        "forwards": row[4],
+        "channel_title": row[5],
+        "channel_username": row[6],
+        "peer_id": row[7],
+    } for row in rows]
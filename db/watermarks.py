@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from db.models import ReportWatermark
+
+# Rows of a transaction that is still open are invisible, but carry ingestion times from when
+# they were written: the window of a run ends before the oldest open transaction that has
+# written anything, its rows fall into the next window once committed.
+_INGEST_FENCE = text("""
+    SELECT LEAST(clock_timestamp(), MIN(xact_start))
+    FROM pg_stat_activity
+    WHERE datname = current_database()
+      AND pid <> pg_backend_pid()
+      AND backend_xid IS NOT NULL
+""")
+
+
+def ingest_fence(conn):
+    """
+    Latest ingestion time up to which every post is committed and visible, the end of a
+    report window: posts with ingested_at < fence
+    """
+    return conn.execute(_INGEST_FENCE).scalar_one()
+
+
+def load_watermarks(conn, names):
+    """
+    :return: {name: ingested_at} of the reports that have a watermark
+    """
+    table = ReportWatermark.__table__
+    rows = conn.execute(select(table.c.name, table.c.ingested_at).where(table.c.name.in_(list(names))))
+    return {row.name: row.ingested_at for row in rows}
+
+
+def advance_watermark(conn, name, ingested_at):
+    """
+    Move the watermark of a report forward to `ingested_at`, never backwards
+    :param conn: connection inside a transaction
+    """
+    table = ReportWatermark.__table__
+    stmt = insert(table).values(name=name, ingested_at=ingested_at, updated_at=datetime.now(timezone.utc))
+    conn.execute(stmt.on_conflict_do_update(index_elements=['name'], set_={
+        'ingested_at': func.greatest(table.c.ingested_at, stmt.excluded.ingested_at),
+        'updated_at': stmt.excluded.updated_at,
+    }))
@@ -0,0 +1,159 @@
+import hashlib
+import math
+import os
+import re
+from functools import lru_cache
+
+# dimension of post_texts.embedding, every embedder has to produce vectors of this size
+EMBEDDING_DIM = 384
+
+# multilingual (Russian, Ukrainian, English) 384-dimensional model, runs on CPU
+DEFAULT_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+# characters of a message that are embedded, longer posts are cut
+MAX_EMBEDDED_CHARS = 2000
+
+_WORD = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=2 ** 18)
+def _bucket(feature, dim):
+    """
+    Stable (unlike hash()) bucket and sign of a feature, the vocabulary repeats a lot
+    """
+    h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder without any model or dependency.
+
+    Words and their character trigrams are hashed into `dim` signed buckets and the
+    vector is L2-normalized, so cosine distance reflects shared vocabulary (including
+    inflected Russian word forms). Not semantic, meant for tests and development.
+    """
+    name = 'hashing'
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text):
+        for word in _WORD.findall(text.lower()):
+            yield word
+            padded = f'<{word}>'
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def embed_one(self, text):
+        vector = [0.0] * self.dim
+        for feature in self._features(text[:MAX_EMBEDDED_CHARS]):
+            index, sign = _bucket(feature, self.dim)
+            vector[index] += sign
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def embed(self, texts):
+        """
+        :param texts: list of strings
+        :return: list of `dim`-sized float lists
+        """
+        return [self.embed_one(text) for text in texts]
+
+
+class SentenceTransformerEmbedder:
+    """
+    Local sentence-transformers model on CPU, needs `pip install sentence-transformers`
+    """
+    name = 'sentence-transformers'
+
+    def __init__(self, model_name=DEFAULT_MODEL, device='cpu', batch_size=64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("EMBEDDER=sentence-transformers needs the sentence-transformers package") from e
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        if self.dim != EMBEDDING_DIM:
+            raise ValueError(f"{model_name} produces {self.dim}-dimensional vectors, "
+                             f"post_texts.embedding holds {EMBEDDING_DIM}")
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        """
+        :param texts: list of strings
+        :return: list of normalized `dim`-sized vectors
+        """
+        vectors = self.model.encode(
+            [text[:MAX_EMBEDDED_CHARS] for text in texts],
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return [vector.tolist() for vector in vectors]
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    SentenceTransformerEmbedder.name: SentenceTransformerEmbedder,
+}
+
+
+def embedder_name(name=None):
+    """
+    Name of the embedder selected by EMBEDDER without loading it
+    :param name: overrides EMBEDDER
+    :return: key of EMBEDDERS, None when embeddings are disabled (EMBEDDER unset or "none")
+    """
+    name = (name or os.getenv('EMBEDDER') or 'none').lower()
+    if name == 'none':
+        return None
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown EMBEDDER {name!r}, expected one of: none, {', '.join(EMBEDDERS)}")
+    return name
+
+
+@lru_cache(maxsize=None)
+def get_embedder(name=None):
+    """
+    Embedder selected by EMBEDDER (hashing, sentence-transformers), loaded once per process
+    :param name: overrides EMBEDDER
+    :return: embedder, None when embeddings are disabled
+    """
+    name = embedder_name(name)
+    if name is None:
+        return None
+    if name == SentenceTransformerEmbedder.name:
+        return SentenceTransformerEmbedder(os.getenv('EMBEDDING_MODEL', DEFAULT_MODEL))
+    return EMBEDDERS[name]()
+
+
+def cosine_distance(a, b):
+    """
+    Cosine distance of two normalized vectors, the `<=>` operator of pgvector
+    """
+    return 1.0 - sum(x * y for x, y in zip(a, b))
+
+
+if __name__ == "__main__":
+    # Throughput: python embeddings.py [messages] [embedder]
+    import sys
+    import time
+
+    from keyword_matcher import _synthetic_corpus
+    from report_profiles import FINLAND_PROFILE
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    embedder = get_embedder(sys.argv[2] if len(sys.argv) > 2 else 'hashing')
+    corpus = [m['message'] for m in _synthetic_corpus(n, ['Финляндия', 'Finland', 'Хельсинки'])]
+
+    t0 = time.perf_counter()
+    vectors = embedder.embed(corpus)
+    elapsed = time.perf_counter() - t0
+    print(f"{embedder.name}: {n / elapsed:,.0f} messages/s")
+
+    query = embedder.embed([FINLAND_PROFILE.semantic_query])[0]
+    nearest = sorted(range(n), key=lambda i: cosine_distance(query, vectors[i]))[:5]
+    for i in nearest:
+        print(f"{cosine_distance(query, vectors[i]):.3f}  {corpus[i][:80]}")
@@ -0,0 +1,169 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+KeywordMatch = namedtuple('KeywordMatch', ['keyword', 'start', 'end', 'text'])
+
+_META = set('.^$*+?{}[]\\|()')
+_QUANTIFIERS = set('?*{')
+_BOUNDARY = r'\b'
+
+
+def _has_top_level_alternation(pattern):
+    depth = 0
+    in_class = False
+    escaped = False
+    for c in pattern:
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return True
+    return False
+
+
+def _first_literal(pattern):
+    """
+    Literal character every match of `pattern` starts with, None if there is no such character
+    """
+    first = pattern[:1]
+    if not first or first in _META or pattern[1:2] in _QUANTIFIERS:
+        return None
+    return first
+
+
+class KeywordMatcher:
+    """
+    Whole keyword profile compiled once into a single regular expression.
+
+    Every pattern becomes one capturing alternative, so a single scan of the text
+    finds the first keyword and tells which one matched. When all patterns start
+    with a word boundary it is checked once for all of them, and when all of them
+    start with a literal character a lookahead on those characters lets the scan
+    skip every other position without trying the alternatives.
+    """
+
+    def __init__(self, patterns, flags=re.IGNORECASE):
+        self.patterns = list(patterns)
+        if not self.patterns:
+            raise ValueError("KeywordMatcher needs at least one pattern")
+
+        # prefix factoring only holds for patterns that are a single sequence
+        simple = not any(_has_top_level_alternation(p) for p in self.patterns)
+        bounded = simple and all(p.startswith(_BOUNDARY) for p in self.patterns)
+        bodies = [p[len(_BOUNDARY):] if bounded else p for p in self.patterns]
+
+        # outer group number of every alternative -> pattern index
+        self._group_keyword = {}
+        group = 1
+        for i, body in enumerate(bodies):
+            self._group_keyword[group] = i
+            group += 1 + re.compile(body, flags).groups
+
+        combined = '|'.join(f'({body})' for body in bodies)
+        if bounded:
+            combined = _BOUNDARY + f'(?:{combined})'
+
+        firsts = [_first_literal(body) for body in bodies]
+        if simple and all(firsts):
+            combined = '(?=[' + ''.join(re.escape(c) for c in sorted(set(firsts))) + '])' + combined
+
+        self.regex = re.compile(combined, flags)
+
+    def _match(self, m):
+        return KeywordMatch(self.patterns[self._group_keyword[m.lastindex]], m.start(), m.end(), m.group())
+
+    def search(self, text):
+        """
+        First keyword occurrence in `text`
+        :return: KeywordMatch(keyword, start, end, text) or None
+        """
+        m = self.regex.search(text)
+        return self._match(m) if m else None
+
+    def finditer(self, text):
+        """
+        Every non-overlapping keyword occurrence in `text`
+        """
+        return (self._match(m) for m in self.regex.finditer(text))
+
+    def filter(self, messages, key='message'):
+        """
+        Messages whose `key` text contains any keyword, empty texts are skipped
+        """
+        search = self.regex.search
+        return [msg for msg in messages if msg.get(key) and search(msg[key])]
+
+
+@lru_cache(maxsize=32)
+def get_matcher(patterns, flags=re.IGNORECASE):
+    """
+    Compiled matcher for a keyword profile, built once per process
+    :param patterns: tuple of regex patterns
+    """
+    return KeywordMatcher(patterns, flags)
+
+
+def _per_pattern_filter(messages, regex_patterns):
+    """
+    The former filter: every pattern compiled and searched on its own
+    """
+    compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in regex_patterns]
+    return [
+        msg for msg in messages
+        if msg.get('message') and any(pattern.search(msg['message']) for pattern in compiled_patterns)
+    ]
+
+
+def _synthetic_corpus(n, hits, hit_rate=0.01, words_per_message=40, seed=1):
+    import random
+
+    rng = random.Random(seed)
+    vocabulary = (
+        "Москва заявила что переговоры продолжатся в среду Україна США Європа санкции нефть газ граница армия "
+        "экономика финансы рынок финал финиш Finance final official statement Helsinki Швеция Норвегия"
+    ).split()
+    messages = []
+    for i in range(n):
+        words = rng.choices(vocabulary, k=words_per_message)
+        if rng.random() < hit_rate:
+            words[rng.randrange(words_per_message)] = rng.choice(hits)
+        messages.append({'message_id': i, 'message': ' '.join(words)})
+    return messages
+
+
+if __name__ == "__main__":
+    # Benchmark: python keyword_matcher.py [messages]
+    import sys
+    import time
+
+    from report_profiles import keywords_regex
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    hits = ['Финляндия', 'финский', 'Finland', 'Фінляндії', 'фінська', 'Finnish', 'ФИНЛЯНДИИ', 'finn']
+    corpus = _synthetic_corpus(n, hits)
+    chars = sum(len(m['message']) for m in corpus)
+    print(f"corpus: {n} messages, {chars / 2 ** 20:.1f} MiB of text")
+
+    t0 = time.perf_counter()
+    expected = _per_pattern_filter(corpus, keywords_regex)
+    per_pattern = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    matcher = KeywordMatcher(keywords_regex)
+    found = matcher.filter(corpus)
+    combined = time.perf_counter() - t0
+
+    assert [m['message_id'] for m in found] == [m['message_id'] for m in expected]
+    print(f"per-pattern: {n / per_pattern:12,.0f} messages/s")
+    print(f"matcher:     {n / combined:12,.0f} messages/s ({per_pattern / combined:.1f}x)")
+    print(f"identical results: {len(found)} matches")
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from telethon import events
+
+# before the project imports, some of them read their settings at import time
+load_dotenv()
+
+from api import RequestBudget, get_connection
+from channel_content import (
+    sfile, api_id, api_hash, phone, channels_list, resolve_channels, HARVEST_RATE, HARVEST_BURST
+)
+from db.engine import get_engine
+from db.ingest import upsert_post_texts, insert_post_entities
+from db.rows import normalize_messages, with_embeddings
+from db.partitions import ensure_partitions_for
+from embeddings import get_embedder
+from metrics import serve
+
+# micro-batching of the live writes
+LIVE_BATCH_SIZE = int(os.getenv('LIVE_BATCH_SIZE', 200))
+LIVE_FLUSH_SECONDS = float(os.getenv('LIVE_FLUSH_SECONDS', 2.0))
+
+
+def save_live_batch(messages: list) -> None:
+    post_texts, post_entities = normalize_messages(messages)
+    post_texts = with_embeddings(post_texts, get_embedder())
+    ensure_partitions_for(get_engine(), [msg.date for msg in messages])
+
+    # the fetch cursor is left alone: a gap while disconnected must still be
+    # picked up by the next download_channel run
+    with get_engine().begin() as conn:
+        counts = upsert_post_texts(conn, post_texts)
+        entity_counts = insert_post_entities(conn, post_entities)
+
+    logging.info(f"Live batch of {len(messages)}: posts inserted {counts['inserted']}, "
+                 f"updated {counts['updated']}; entities inserted {entity_counts['inserted']}")
+
+
+async def flush_forever(queue: asyncio.Queue) -> None:
+    """
+    Write queued messages once LIVE_BATCH_SIZE is reached or LIVE_FLUSH_SECONDS passed
+    """
+    while True:
+        batch = [await queue.get()]
+        deadline = time.monotonic() + LIVE_FLUSH_SECONDS
+        while len(batch) < LIVE_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            await asyncio.to_thread(save_live_batch, batch)
+        except Exception as e:
+            logging.error(f"Failed to save live batch of {len(batch)} messages: {e}")
+
+
+async def run_live_ingest(channels: list) -> None:
+    """
+    Subscribe to new and edited posts of the monitored channels and store them as they arrive
+    """
+    client = await get_connection(sfile, api_id, api_hash, phone)
+    logging.info("Client connection established")
+
+    budget = RequestBudget(rate=HARVEST_RATE, burst=HARVEST_BURST)
+    peers = await resolve_channels(client, budget, channels)
+    chats = list(peers.values())
+
+    queue = asyncio.Queue()
+
+    async def on_message(event):
+        queue.put_nowait(event.message)
+
+    client.add_event_handler(on_message, events.NewMessage(chats=chats))
+    client.add_event_handler(on_message, events.MessageEdited(chats=chats))
+    logging.info(f"Listening to {len(chats)} channels")
+
+    flusher = asyncio.create_task(flush_forever(queue))
+    try:
+        await client.run_until_disconnected()
+    finally:
+        flusher.cancel()
+        # write what is still queued
+        pending = []
+        while not queue.empty():
+            pending.append(queue.get_nowait())
+        if pending:
+            save_live_batch(pending)
+        await client.disconnect()
+
+
+if __name__ == '__main__':
+    serve()
+    asyncio.run(run_live_ingest(channels_list))
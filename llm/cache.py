@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+# LLM_CACHE=0 disables the cache
+LLM_CACHE = os.getenv('LLM_CACHE', '1') != '0'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_responses.sqlite'))
+# least recently used responses are evicted above this size
+LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB', 256))
+
+
+def cache_key(backend, model, params, chat_messages):
+    """
+    Content address of a request: hash of backend, model, parameters and the exact messages
+    """
+    payload = json.dumps([backend, model, params, chat_messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of completion texts in a SQLite file, safe to share between threads
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=int(LLM_CACHE_MAX_MB * 2 ** 20)):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+
+    def get(self, key):
+        """
+        :return: cached completion text, None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, value):
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+
+    def stats(self):
+        """
+        :return: (entries, bytes)
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+
+@lru_cache(maxsize=None)
+def get_cache():
+    """
+    Process-wide response cache, None when LLM_CACHE=0
+    """
+    return ResponseCache() if LLM_CACHE else None
+
+
+def cached_completion(backend, model, params, chat_messages, complete):
+    """
+    Completion text from the cache, or from `complete()` which is stored on success.
+
+    `complete` has to raise on failure: error messages must never end up in the cache.
+    :param backend: "openai", "ollama", ...
+    :param model: model name
+    :param params: request parameters that change the answer (max_tokens, temperature, ...)
+    :param chat_messages: list of {"role": ..., "content": ...}
+    :param complete: function without arguments performing the request
+    """
+    cache = get_cache()
+    if cache is None:
+        return complete()
+
+    key = cache_key(backend, model, params, chat_messages)
+    value = cache.get(key)
+    if value is None:
+        value = complete()
+        cache.put(key, value)
+    return value
+
+
+if __name__ == "__main__":
+    # Cache statistics: python -m llm.cache
+    entries, size = ResponseCache().stats()
+    print(f"{LLM_CACHE_PATH}: {entries} responses, {size / 2 ** 20:.1f} MiB (limit {LLM_CACHE_MAX_MB:g} MiB)")
@@ -0,0 +1,93 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from llm.packer import SEPARATOR, chunk_blocks, message_blocks, message_budget
+from llm.tokens import count_chat_tokens, count_tokens, truncate_tokens
+
+# message IDs cited as "(123)" or "(123, 456)"
+_CITATION = re.compile(r'\(([\d, ]+)\)')
+
+
+def cited_ids(text):
+    """
+    Message IDs cited in parentheses in `text`
+    """
+    return {part.strip() for group in _CITATION.findall(text) for part in group.split(',') if part.strip()}
+
+
+def _prompt_tokens(model, system_prompt, user_template):
+    return count_chat_tokens([
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_template.format(messages_text="")},
+    ], model)
+
+
+def _chat(system_prompt, user_template, text):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_template.format(messages_text=text)},
+    ]
+
+
+def summarize_map_reduce(messages, model, complete, system_prompt, map_template, reduce_template,
+                         max_response_tokens, concurrency=4, skip=(), final_suffix='', final_max_tokens=None):
+    """
+    Summarize any number of messages: chunks that each fill the model's token budget are
+    summarized concurrently (map), then the partial summaries are merged (reduce), in
+    several rounds if they do not fit into one prompt.
+
+    Coverage is every message; wall-clock time grows with the number of chunks divided
+    by `concurrency` plus a logarithmic number of reduce rounds.
+    :param messages: message dicts as returned by teleflash.fetch_data_for_specific_channels
+    :param model: chat model, sets the context window and the tokenizer
+    :param complete: function(chat_messages, max_tokens) -> completion text, raising on failure
+    :param system_prompt: system prompt of every request
+    :param map_template: user prompt of a chunk, with a `{messages_text}` placeholder
+    :param reduce_template: user prompt merging partial summaries, with a `{messages_text}` placeholder
+    :param max_response_tokens: completion tokens per request
+    :param concurrency: requests running at the same time
+    :param skip: partial summaries without content (e.g. "Nothing newsworthy ..."), left out of the reduce
+    :param final_suffix: instructions appended to the user prompt of the request producing the
+        final summary only, e.g. asking for a second language
+    :param final_max_tokens: completion tokens of that request, `max_response_tokens` when None
+    :return: (summary, number of map chunks)
+    """
+    final_max_tokens = final_max_tokens or max_response_tokens
+    separator_tokens = count_tokens(SEPARATOR, model)
+    # budgets sized for the final request, any round may turn out to be the last one
+    map_budget = message_budget(model, _prompt_tokens(model, system_prompt, map_template + final_suffix),
+                                max(max_response_tokens, final_max_tokens))
+    chunks = chunk_blocks(message_blocks(messages, model), map_budget, separator_tokens)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def run(template, chunk_list, max_tokens=max_response_tokens):
+            texts = [SEPARATOR.join(block[1] for block in chunk) for chunk in chunk_list]
+            return list(pool.map(
+                lambda text: complete(_chat(system_prompt, template, text), max_tokens), texts
+            ))
+
+        if len(chunks) == 1:
+            return run(map_template + final_suffix, chunks, final_max_tokens)[0], 1
+        partials = run(map_template, chunks)
+
+        reduce_budget = message_budget(model, _prompt_tokens(model, system_prompt, reduce_template + final_suffix),
+                                       max(max_response_tokens, final_max_tokens))
+        while True:
+            partials = [p for p in partials if p.strip() not in skip]
+            if not partials:
+                return skip[0] if skip else "", len(chunks)
+
+            if len(partials) == 1 and not final_suffix:
+                return partials[0], len(chunks)
+
+            blocks = [(None, p, count_tokens(p, model)) for p in partials]
+            groups = chunk_blocks(blocks, reduce_budget, separator_tokens)
+            if len(groups) == len(partials) > 1:
+                # small context window: shorten the partials so that at least two merge per request
+                limit = (reduce_budget - separator_tokens) // 2
+                shortened = [truncate_tokens(p, limit, model) for p in partials]
+                blocks = [(None, p, count_tokens(p, model)) for p in shortened]
+                groups = chunk_blocks(blocks, reduce_budget, separator_tokens)
+            if len(groups) == 1:
+                return run(reduce_template + final_suffix, groups, final_max_tokens)[0], len(chunks)
+            partials = run(reduce_template, groups)
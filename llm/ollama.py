@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm.tokens import register_context_window
+
+OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
+# requests the server works on at the same time, more are queued here
+OLLAMA_CONCURRENCY = int(os.getenv('OLLAMA_CONCURRENCY', 2))
+# context window requested from the server (Ollama's own default is only 2048)
+OLLAMA_NUM_CTX = int(os.getenv('OLLAMA_NUM_CTX', 8192))
+# prompts are counted with a tiktoken encoding, not the model's tokenizer: keep a margin
+TOKEN_COUNT_MARGIN = 0.85
+# seconds to connect, and to wait for the next streamed chunk
+OLLAMA_TIMEOUT = (5, float(os.getenv('OLLAMA_READ_TIMEOUT', 120)))
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaClient:
+    """
+    Chat client for an Ollama-compatible server (POST /api/chat).
+
+    One pooled keep-alive session is shared by all threads; at most `concurrency`
+    requests are in flight, the others wait for a slot.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, model=OLLAMA_MODEL, concurrency=OLLAMA_CONCURRENCY,
+                 num_ctx=OLLAMA_NUM_CTX, timeout=OLLAMA_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.num_ctx = num_ctx
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        register_context_window(model, int(num_ctx * TOKEN_COUNT_MARGIN))
+
+    def chat(self, chat_messages, max_tokens, temperature=0.7, top_p=0.9, on_token=None, on_usage=None):
+        """
+        Streamed chat completion
+        :param chat_messages: list of {"role": ..., "content": ...}
+        :param max_tokens: maximum completion tokens (num_predict)
+        :param on_token: called with every streamed piece of text, e.g. for progress output
+        :param on_usage: called with (prompt tokens, completion tokens) as counted by the server
+        :return: completion text
+        :raise OllamaError: error reported by the server
+        :raise requests.RequestException: connection problems and HTTP errors
+        """
+        payload = {
+            "model": self.model,
+            "messages": chat_messages,
+            "stream": True,
+            "options": {
+                "num_predict": max_tokens,
+                "num_ctx": self.num_ctx,
+                "temperature": temperature,
+                "top_p": top_p,
+            },
+        }
+        with self._slots:
+            with self.session.post(f"{self.base_url}/api/chat", json=payload, stream=True,
+                                   timeout=self.timeout) as response:
+                response.raise_for_status()
+                pieces = []
+                # read to the end of the stream even after the done chunk: a response left
+                # unread is closed instead of returning its connection to the pool
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if 'error' in chunk:
+                        raise OllamaError(chunk['error'])
+                    piece = chunk.get('message', {}).get('content', '')
+                    if piece:
+                        pieces.append(piece)
+                        if on_token:
+                            on_token(piece)
+                    if chunk.get('done') and on_usage:
+                        on_usage(chunk.get('prompt_eval_count', 0), chunk.get('eval_count', 0))
+        return ''.join(pieces).strip()
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide client configured by OLLAMA_URL, OLLAMA_MODEL, OLLAMA_CONCURRENCY and OLLAMA_NUM_CTX
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+def _stand_in_server(port=0, delay=0.2, words=50):
+    """
+    Minimal Ollama-compatible server streaming `words` words over `delay` seconds per request.
+    `server.connections` counts the TCP connections accepted.
+    """
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            with lock:
+                server.connections += 1
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            prompt = request['messages'][-1]['content']
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(words):
+                time.sleep(delay / words)
+                self._chunk({"message": {"role": "assistant", "content": f"w{i} "}, "done": False})
+            self._chunk({"message": {"role": "assistant", "content": f"({len(prompt)})"}, "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, obj):
+            data = json.dumps(obj).encode() + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    lock = threading.Lock()
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # Against a local stand-in server: python -m llm.ollama [requests] [concurrency]
+    import sys
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server = _stand_in_server()
+    client = OllamaClient(f"http://127.0.0.1:{server.server_address[1]}", 'stand-in', concurrency=concurrency)
+    chats = [[{"role": "user", "content": "x" * i}] for i in range(n)]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        answers = list(pool.map(lambda chat: client.chat(chat, max_tokens=64), chats))
+    elapsed = time.perf_counter() - t0
+
+    assert all(answer.endswith(f"({i})") for i, answer in enumerate(answers))
+    print(f"{n} streamed requests, {concurrency} at a time: {elapsed:.2f}s "
+          f"(sequential would take about {n * 0.2:.1f}s), {server.connections} connections")
+    assert server.connections <= concurrency
+
+    # sequential requests reuse the pooled keep-alive connections
+    opened = server.connections
+    for chat in chats:
+        client.chat(chat, max_tokens=64)
+    assert server.connections == opened, f"{server.connections - opened} new connections"
+    server.shutdown()
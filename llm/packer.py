@@ -0,0 +1,146 @@
+import math
+from datetime import datetime, timezone
+
+from llm.tokens import context_window, count_chat_tokens, count_tokens, get_encoding, truncate_tokens
+
+# separator between two message blocks in the prompt
+SEPARATOR = "\n\n"
+# longest single message, so one long post cannot take the budget of many
+MAX_MESSAGE_TOKENS = 400
+
+
+def telegram_link(channel_username, message_id):
+    """Create a Telegram message link."""
+    if not channel_username:
+        return str(message_id)
+    return f"<https://t.me/{channel_username}/{message_id}>"
+
+
+def format_message(msg, text):
+    """
+    Prompt block of one message, `text` is the (possibly truncated) message text
+    """
+    return (
+        f"Message ID: {msg['message_id']}\n"
+        f"Channel: {msg['channel_title']} ({msg['channel_username']})\n"
+        f"Date: {msg['date']}\n"
+        f"Message: {text}\n"
+        f"Views: {msg['views']}, Forwards: {msg['forwards']}\n"
+        f"Link: {telegram_link(msg['channel_username'], msg['message_id'])}"
+    )
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    # plain dates count from midnight UTC
+    return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+
+
+def message_priority(msg, now=None):
+    """
+    Default packing priority: reach (views), spread (forwards weigh double) and recency
+    (one point lost per day of age)
+    """
+    now = now or datetime.now(timezone.utc)
+    age_days = max((now - _as_datetime(msg['date'])).total_seconds(), 0) / 86400
+    return math.log1p(msg['views'] or 0) + 2 * math.log1p(msg['forwards'] or 0) - age_days
+
+
+def message_blocks(messages, model, priority=message_priority, max_message_tokens=MAX_MESSAGE_TOKENS):
+    """
+    Prompt blocks of `messages`, formatted and counted once, highest priority first
+    :return: list of (message, block text, block tokens)
+    """
+    blocks = []
+    for msg in sorted(messages, key=priority, reverse=True):
+        block = format_message(msg, truncate_tokens(msg['message'] or '', max_message_tokens, model))
+        blocks.append((msg, block, count_tokens(block, model)))
+    return blocks
+
+
+def message_budget(model, prompt_tokens, max_response_tokens):
+    """
+    Tokens left for the messages in the context window of `model`
+    """
+    return context_window(model) - prompt_tokens - max_response_tokens
+
+
+def pack_messages(messages, model, prompt_tokens, max_response_tokens, priority=message_priority,
+                  max_message_tokens=MAX_MESSAGE_TOKENS, budget=None):
+    """
+    Pick the messages that fit into the context window of `model`, highest priority first.
+
+    Every message is formatted and counted once; a message that does not fit is skipped
+    and smaller, lower-priority ones still fill the remaining budget.
+    :param messages: message dicts as returned by teleflash.fetch_data_for_specific_channels
+    :param model: chat model, sets the context window and the tokenizer
+    :param prompt_tokens: tokens of the prompt around the messages (see count_chat_tokens)
+    :param max_response_tokens: tokens reserved for the completion
+    :param priority: key function, higher values are packed first
+    :param max_message_tokens: message texts are cut to this many tokens
+    :param budget: tokens available for the messages, overrides the context window arithmetic
+    :return: (packed messages in priority order, their prompt text, tokens of that text)
+    """
+    if budget is None:
+        budget = message_budget(model, prompt_tokens, max_response_tokens)
+    separator_tokens = count_tokens(SEPARATOR, model)
+
+    packed, blocks, used = [], [], 0
+    for msg, block, tokens in message_blocks(messages, model, priority, max_message_tokens):
+        cost = tokens + (separator_tokens if blocks else 0)
+        if used + cost > budget:
+            continue
+        packed.append(msg)
+        blocks.append(block)
+        used += cost
+
+    text = SEPARATOR.join(blocks)
+    # the sum of block counts equals the count of the joined text for the tiktoken
+    # encodings (newlines never merge with the following word), checked to stay exact
+    while blocks and len(get_encoding(model).encode(text)) > budget:
+        packed.pop()
+        blocks.pop()
+        text = SEPARATOR.join(blocks)
+
+    return packed, text, count_tokens(text, model) if blocks else 0
+
+
+def chunk_blocks(blocks, budget, separator_tokens):
+    """
+    Split counted blocks into consecutive chunks of at most `budget` tokens each
+    :param blocks: list of (item, text, tokens), a block larger than `budget` gets a chunk of its own
+    :return: list of chunks, each a list of blocks
+    """
+    chunks, chunk, used = [], [], 0
+    for block in blocks:
+        cost = block[2] + (separator_tokens if chunk else 0)
+        if chunk and used + cost > budget:
+            chunks.append(chunk)
+            chunk, used = [], 0
+            cost = block[2]
+        chunk.append(block)
+        used += cost
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def pack_prompt(messages, model, system_prompt, user_template, max_response_tokens, **kwargs):
+    """
+    Chat messages for a summary request holding as many messages as the model allows.
+    :param user_template: user prompt with a `{messages_text}` placeholder
+    :return: ([system message, user message], packed messages)
+    """
+    empty = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_template.format(messages_text="")},
+    ]
+    packed, messages_text, _ = pack_messages(
+        messages, model, count_chat_tokens(empty, model), max_response_tokens, **kwargs
+    )
+    chat = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_template.format(messages_text=messages_text)},
+    ]
+    return chat, packed
@@ -0,0 +1,290 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# fraction of the provider limits actually used, keeps clock skew and other clients from tipping it over
+LIMIT_HEADROOM = float(os.getenv('LLM_LIMIT_HEADROOM', 0.95))
+# seconds of budget that may be spent back to back
+BURST_SECONDS = float(os.getenv('LLM_BURST_SECONDS', 10))
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_UNIT_SECONDS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+class RetryableError(Exception):
+    """
+    Failed request that may succeed when sent again after `retry_after` seconds (None: unknown)
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(RetryableError):
+    """
+    The provider refused the request because of its rate limits (HTTP 429)
+    """
+
+
+def parse_retry_after(headers):
+    """
+    Seconds to wait according to the response headers of a refused request, None without a hint.
+
+    Understands Retry-After (seconds), retry-after-ms and the x-ratelimit-reset-* durations
+    such as "1s", "6m0s" or "20ms".
+    """
+    if not headers:
+        return None
+    headers = {k.lower(): v for k, v in dict(headers).items()}
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000
+        if 'retry-after' in headers:
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+
+    waits = []
+    for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens'):
+        parts = _DURATION_PART.findall(headers.get(name) or '')
+        if parts:
+            waits.append(sum(float(value) * _UNIT_SECONDS[unit] for value, unit in parts))
+    return max(waits) if waits else None
+
+
+class _Bucket:
+    """
+    Token bucket refilled at `per_minute` / 60 per second, holding `burst_seconds` of budget.
+
+    Requests are charged in full. A request larger than the bucket waits for a full bucket
+    and leaves it in debt (negative level), which the next requests wait off.
+    """
+
+    def __init__(self, per_minute, burst_seconds):
+        self.rate = per_minute / 60
+        self.capacity = self.rate * burst_seconds
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now, scale):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def wait_time(self, now, amount, scale):
+        self._refill(now, scale)
+        # a request larger than the bucket waits for a full bucket instead of forever
+        needed = min(amount, self.capacity)
+        return max(needed - self.level, 0) / (self.rate * scale)
+
+    def take(self, amount):
+        self.level -= amount
+
+
+class RateLimiter:
+    """
+    Scheduler for the requests of one provider: requests-per-minute and tokens-per-minute
+    budgets, first come first served, shared by all threads.
+
+    The refill rate adapts AIMD-style: a refused request halves it and pauses everyone for
+    the retry-after time, every successful request raises it again by `increase` of the limit.
+    Throughput therefore settles just under the real limit instead of alternating between
+    bursts and rejections.
+    """
+
+    def __init__(self, rpm=None, tpm=None, headroom=LIMIT_HEADROOM, burst_seconds=BURST_SECONDS,
+                 increase=0.05, decrease=0.5, min_scale=0.05):
+        self._requests = _Bucket(rpm * headroom, burst_seconds) if rpm else None
+        self._tokens = _Bucket(tpm * headroom, burst_seconds) if tpm else None
+        self.increase = increase
+        self.decrease = decrease
+        self.min_scale = min_scale
+        self.scale = 1.0
+        self._paused_until = 0.0
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def _wait_time(self, now, tokens):
+        wait = self._paused_until - now
+        if self._requests:
+            wait = max(wait, self._requests.wait_time(now, 1, self.scale))
+        if self._tokens:
+            wait = max(wait, self._tokens.wait_time(now, tokens, self.scale))
+        return wait
+
+    def _take(self, tokens):
+        if self._requests:
+            self._requests.take(1)
+        if self._tokens:
+            self._tokens.take(tokens)
+
+    def acquire(self, tokens=0):
+        """
+        Block until a request of `tokens` tokens fits into the budgets, in arrival order
+        """
+        ticket = object()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    if self._queue[0] is ticket:
+                        wait = self._wait_time(time.monotonic(), tokens)
+                        if wait <= 0:
+                            self._take(tokens)
+                            return
+                    else:
+                        wait = None
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def penalize(self, retry_after):
+        """
+        A request was refused: pause all requests for `retry_after` seconds and slow down
+        """
+        with self._cond:
+            self.scale = max(self.min_scale, self.scale * self.decrease)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._cond.notify_all()
+
+    def reward(self):
+        with self._cond:
+            self.scale = min(1.0, self.scale + self.increase)
+
+    def call(self, request, tokens=0, max_retries=6):
+        """
+        Run `request()` within the budgets, retrying refused and transient failures.
+        :param request: function without arguments raising RetryableError for retryable failures
+        :param tokens: tokens the request counts against the TPM limit (prompt + max completion)
+        :param max_retries: attempts after the first one
+        :return: result of `request()`
+        :raise RetryableError: when the last attempt failed as well
+        """
+        for attempt in range(max_retries + 1):
+            self.acquire(tokens)
+            try:
+                result = request()
+            except RetryableError as e:
+                if attempt == max_retries:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else min(2 ** attempt, 60)
+                if isinstance(e, RateLimited):
+                    self.penalize(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            self.reward()
+            return result
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider, rpm=None, tpm=None):
+    """
+    The process-wide RateLimiter of `provider`, created with `rpm` and `tpm` on first use
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(rpm, tpm)
+        return _limiters[provider]
+
+
+def _schedule(limiter, requests, start=0.0):
+    """
+    Send times the limiter gives `requests` (token estimates) queued at once, on a simulated clock
+    """
+    for bucket in (limiter._requests, limiter._tokens):
+        if bucket:
+            bucket.updated = start
+    now, times = start, []
+    for tokens in requests:
+        now += max(limiter._wait_time(now, tokens), 0)
+        limiter._take(tokens)
+        times.append(now)
+    return times
+
+
+def _check_token_windows(tpm=90000, window=600):
+    """
+    Oversized and mixed requests on a simulated clock never put more than the TPM limit
+    per minute into any `window` seconds
+    """
+    import random
+
+    random.seed(1)
+    oversized = [16385] * 60
+    mixed = [random.choice((200, 4000, 16385, 30000)) for _ in range(400)]
+    for label, requests in (("oversized", oversized), ("mixed", mixed)):
+        times = _schedule(RateLimiter(rpm=3500, tpm=tpm), requests)
+        sent = list(zip(times, requests))
+        busiest = max(sum(tokens for t, tokens in sent if start <= t < start + window) for start in times)
+        per_minute = busiest / window * 60
+        assert per_minute <= tpm, f"{label}: {per_minute:.0f} tokens per minute, limit {tpm}"
+        print(f"{label:9}: {len(requests)} requests, busiest {window}s window "
+              f"{per_minute:.0f} tokens per minute (limit {tpm})")
+
+
+if __name__ == "__main__":
+    # Budget check on a simulated clock, then a simulated provider with time compressed
+    # tenfold (one "minute" lasts 6 seconds): python -m llm.ratelimit [seconds] [threads]
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    _check_token_windows()
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    minute = 6.0
+    provider_tpm, request_tokens = 20000, 500
+
+    class Provider:
+        """Refuses a request when the tokens of the last "minute" would exceed provider_tpm"""
+
+        def __init__(self):
+            self.window = deque()
+            self.lock = threading.Lock()
+            self.accepted = self.refused = 0
+
+        def __call__(self):
+            with self.lock:
+                now = time.monotonic()
+                while self.window and self.window[0] < now - minute:
+                    self.window.popleft()
+                if (len(self.window) + 1) * request_tokens > provider_tpm:
+                    self.refused += 1
+                    raise RateLimited("429", retry_after=minute / 60)
+                self.window.append(now)
+                self.accepted += 1
+            time.sleep(0.05)
+
+    def fixed_backoff(provider):
+        # the former approach: every caller sleeps and retries on its own
+        while True:
+            try:
+                return provider()
+            except RateLimited:
+                time.sleep(0.5)
+
+    limiter = RateLimiter(tpm=provider_tpm * 60 / minute, burst_seconds=BURST_SECONDS * minute / 60)
+    for label, send in (("fixed backoff", fixed_backoff),
+                        ("scheduler", lambda provider: limiter.call(provider, request_tokens, max_retries=100))):
+        provider = Provider()
+        deadline = time.monotonic() + seconds
+
+        def worker():
+            while time.monotonic() < deadline:
+                send(provider)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in range(threads):
+                pool.submit(worker)
+        elapsed = time.monotonic() - started
+        limit = provider_tpm / request_tokens
+        print(f"{label:14}: {provider.accepted / elapsed * minute:5.1f} accepted per minute "
+              f"(limit {limit:.0f}), {provider.refused} refused")
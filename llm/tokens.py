@@ -0,0 +1,82 @@
+import os
+from functools import lru_cache
+
+# context window (prompt + completion tokens) per model, prefixes match dated snapshots
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-3.5-turbo-0613': 4096,
+    'gpt-3.5-turbo-16k': 16385,
+    'gpt-3.5-turbo': 16385,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4o-mini': 128000,
+    'gpt-4o': 128000,
+    'gpt-4.1': 1047576,
+    'gpt-4': 8192,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.getenv('LLM_CONTEXT_WINDOW', 4096))
+
+# tokens the chat format adds around every message and before the reply
+TOKENS_PER_CHAT_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+# windows of models configured at runtime (local models), exact names
+_registered_windows = {}
+
+
+def register_context_window(model, tokens):
+    """
+    Context window of a model served with a configurable context, e.g. by Ollama
+    """
+    _registered_windows[model] = tokens
+
+
+def context_window(model):
+    """
+    Context window of `model`: a registered window, else the longest matching prefix of
+    MODEL_CONTEXT_WINDOWS; unknown models get LLM_CONTEXT_WINDOW (default 4096)
+    """
+    if model in _registered_windows:
+        return _registered_windows[model]
+    for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    """
+    tiktoken encoding of `model`, loaded once per process (cl100k_base for unknown models)
+    """
+    # imported on first use, it is slow to import
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def count_tokens(text, model):
+    return len(get_encoding(model).encode(text))
+
+
+def truncate_tokens(text, max_tokens, model):
+    """
+    `text` cut to its first `max_tokens` tokens
+    """
+    tokens = get_encoding(model).encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return get_encoding(model).decode(tokens[:max_tokens])
+
+
+def count_chat_tokens(chat_messages, model):
+    """
+    Prompt tokens of a chat completion request
+    :param chat_messages: list of {"role": ..., "content": ...}
+    """
+    return TOKENS_PER_REPLY + sum(
+        TOKENS_PER_CHAT_MESSAGE + count_tokens(m['content'], model) for m in chat_messages
+    )
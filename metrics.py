@@ -0,0 +1,103 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server, write_to_textfile
+
+# Settings are read when serve and export run, not at import: this module is imported by
+# api before the entry points have loaded .env
+#   METRICS_PORT      port of the /metrics endpoint of long-running processes
+#                     (scheduler, worker --wait, live_ingest), 0: off
+#   METRICS_TEXTFILE  file rewritten after every run, for the node_exporter textfile collector
+
+REGISTRY = CollectorRegistry()
+
+# seconds, from a fast Telegram call up to a long summary request
+_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+TELEGRAM_REQUESTS = Counter('teleflash_telegram_requests', "Telegram API requests",
+                            ['method', 'outcome'], registry=REGISTRY)
+TELEGRAM_REQUEST_SECONDS = Histogram('teleflash_telegram_request_seconds', "Telegram API request latency",
+                                     ['method'], buckets=_BUCKETS, registry=REGISTRY)
+TELEGRAM_BUDGET_WAIT_SECONDS = Histogram('teleflash_telegram_budget_wait_seconds',
+                                         "Time a request waited for the shared request budget",
+                                         buckets=_BUCKETS, registry=REGISTRY)
+TELEGRAM_FLOOD_WAIT_SECONDS = Counter('teleflash_telegram_flood_wait_seconds', "FloodWait seconds requested by Telegram",
+                                      ['method'], registry=REGISTRY)
+
+POSTS_FETCHED = Counter('teleflash_posts_fetched', "Posts fetched from Telegram", ['channel'], registry=REGISTRY)
+POSTS_STORED = Counter('teleflash_posts_stored', "Posts written to post_texts",
+                       ['channel', 'result'], registry=REGISTRY)
+
+FILTER_MESSAGES = Counter('teleflash_filter_messages', "Posts of the report windows, before any keyword filter",
+                          registry=REGISTRY)
+FILTER_CANDIDATES = Counter('teleflash_filter_candidates', "Posts of the report windows passing the SQL keyword prefilter",
+                            registry=REGISTRY)
+FILTER_SELECTED = Counter('teleflash_filter_selected', "Messages selected for a report profile",
+                          ['profile', 'source'], registry=REGISTRY)
+
+LLM_REQUESTS = Counter('teleflash_llm_requests', "Chat completions by backend and outcome (ok, error, cached)",
+                       ['backend', 'model', 'outcome'], registry=REGISTRY)
+LLM_REQUEST_SECONDS = Histogram('teleflash_llm_request_seconds', "Chat completion latency, cache hits excluded",
+                                ['backend', 'model'], buckets=_BUCKETS, registry=REGISTRY)
+LLM_TOKENS = Counter('teleflash_llm_tokens', "Tokens used by chat completions",
+                     ['backend', 'model', 'kind'], registry=REGISTRY)
+
+SLACK_POSTS = Counter('teleflash_slack_posts', "Slack messages posted", ['kind', 'outcome'], registry=REGISTRY)
+SLACK_POST_SECONDS = Histogram('teleflash_slack_post_seconds', "Slack chat.postMessage latency",
+                               ['kind'], buckets=_BUCKETS, registry=REGISTRY)
+
+STAGE_SECONDS = Histogram('teleflash_stage_seconds', "Pipeline stage duration", ['stage'],
+                          buckets=_BUCKETS, registry=REGISTRY)
+STAGE_RUNS = Counter('teleflash_stage_runs', "Pipeline stages by outcome (ok, failed, skipped)",
+                     ['stage', 'outcome'], registry=REGISTRY)
+RUNS = Counter('teleflash_runs', "Scheduled runs by outcome", ['outcome'], registry=REGISTRY)
+LAST_RUN = Gauge('teleflash_last_run_timestamp_seconds', "End of the last scheduled run by outcome",
+                 ['outcome'], registry=REGISTRY)
+
+
+@contextmanager
+def timed(histogram, counter=None, **labels):
+    """
+    Observe the duration of the block in `histogram`; with `counter`, count it by `labels`
+    plus outcome="ok" or "error"
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - started
+        (histogram.labels(**labels) if labels else histogram).observe(elapsed)
+        if counter is not None:
+            counter.labels(**labels, outcome=outcome).inc()
+
+
+def serve(port=None):
+    """
+    Start the /metrics HTTP endpoint (Prometheus text, OpenMetrics on request) when `port` is set
+    :param port: defaults to METRICS_PORT
+    """
+    if port is None:
+        port = int(os.getenv('METRICS_PORT', 0))
+    if port:
+        start_http_server(port, registry=REGISTRY)
+
+
+def export(path=None):
+    """
+    Write every metric of this process to `path` when set; the file is replaced atomically
+    :param path: defaults to METRICS_TEXTFILE
+    """
+    if path is None:
+        path = os.getenv('METRICS_TEXTFILE', '')
+    if path:
+        write_to_textfile(path, REGISTRY)
+
+
+if __name__ == "__main__":
+    # Current metrics of a fresh process in the OpenMetrics format: python metrics.py
+    from prometheus_client.openmetrics.exposition import generate_latest
+
+    print(generate_latest(REGISTRY).decode())
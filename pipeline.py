@@ -0,0 +1,168 @@
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from dotenv import load_dotenv
+
+# before the project imports, some of them read their settings at import time
+load_dotenv()
+
+from metrics import STAGE_RUNS, STAGE_SECONDS, export
+
+# direct: this process harvests every channel; queue: per-channel jobs in channel_jobs,
+# shared with the worker.py processes running elsewhere
+INGEST_MODE = os.getenv('INGEST_MODE', 'direct')
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a pipeline: `run(results)` gets the outputs of the stages run so far by name
+    and returns its own output; it starts once every stage in `after` succeeded.
+    """
+    name: str
+    run: Callable
+    after: tuple = ()
+
+
+@dataclass
+class PipelineRun:
+    results: dict
+    timings: dict
+    failed: list
+    skipped: list
+
+    @property
+    def ok(self):
+        return not self.failed and not self.skipped
+
+
+def execution_order(stages):
+    """
+    Stages sorted so that every stage comes after the stages it depends on
+    :raise ValueError: unknown dependency or cycle
+    """
+    by_name = {stage.name: stage for stage in stages}
+    order, done, visiting = [], set(), set()
+
+    def visit(stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Dependency cycle through stage {stage.name}")
+        visiting.add(stage.name)
+        for name in stage.after:
+            if name not in by_name:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {name}")
+            visit(by_name[name])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        order.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return order
+
+
+def run_pipeline(stages):
+    """
+    Run the stages in dependency order in this process, timing each one.
+
+    A failing stage is logged and the stages depending on it, directly or not, are skipped;
+    independent stages still run.
+    :param stages: list of Stage
+    :return: PipelineRun with the outputs and the seconds spent per stage
+    """
+    run = PipelineRun(results={}, timings={}, failed=[], skipped=[])
+    for stage in execution_order(stages):
+        blocked = [name for name in stage.after if name not in run.results]
+        if blocked:
+            logging.error(f"Skipping stage {stage.name}: {', '.join(blocked)} did not complete")
+            run.skipped.append(stage.name)
+            STAGE_RUNS.labels(stage.name, 'skipped').inc()
+            continue
+
+        logging.info(f"Starting stage {stage.name}")
+        started = time.perf_counter()
+        outcome = 'failed'
+        try:
+            run.results[stage.name] = stage.run(run.results)
+            outcome = 'ok'
+        except Exception as e:
+            logging.exception(f"Stage {stage.name} failed: {e}")
+            run.failed.append(stage.name)
+        finally:
+            run.timings[stage.name] = time.perf_counter() - started
+            STAGE_SECONDS.labels(stage.name).observe(run.timings[stage.name])
+            STAGE_RUNS.labels(stage.name, outcome).inc()
+        logging.info(f"Stage {stage.name} took {run.timings[stage.name]:.2f}s")
+
+    total = sum(run.timings.values())
+    logging.info("Pipeline timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in run.timings.items())
+                 + f"; total {total:.2f}s")
+    export()
+    return run
+
+
+def daily_stages(engine=None, profiles=None, ingest=True):
+    """
+    Ingest, filter, summarize and publish as one DAG sharing a single engine; the messages
+    and reports are handed from stage to stage in memory.
+    :param engine: SQLAlchemy engine, the process-wide one when None
+    :param profiles: report profiles, REPORT_PROFILES_FILE when None
+    :param ingest: False to report on the posts already stored
+    """
+    from channel_content import channels_list, download_channel
+    from db.engine import get_engine
+    from report_profiles import load_profiles
+    from teleflash import (
+        advance_watermarks, collect_report_messages, publish_reports, report_window, summarize_reports
+    )
+
+    engine = engine or get_engine()
+    stages = [
+        Stage('profiles', lambda results: profiles or load_profiles()),
+        # the window ends at what has been ingested and committed by now
+        Stage('window', lambda results: report_window(engine, results['profiles']),
+              after=('ingest', 'profiles') if ingest else ('profiles',)),
+        Stage('messages', lambda results: collect_report_messages(engine, results['profiles'], results['window']),
+              after=('profiles', 'window')),
+        Stage('reports', lambda results: summarize_reports(engine, results['profiles'], results['messages']),
+              after=('profiles', 'messages')),
+        Stage('publish', lambda results: publish_reports(results['profiles'], results['reports']),
+              after=('profiles', 'reports')),
+        # a failed run leaves the watermarks alone, the next run processes the same posts
+        Stage('watermarks', lambda results: advance_watermarks(engine, results['publish'], results['window'][1]),
+              after=('window', 'publish')),
+    ]
+    if ingest:
+        if INGEST_MODE == 'queue':
+            from worker import run_queued_ingest
+            harvest = run_queued_ingest
+        else:
+            harvest = download_channel
+        stages.insert(0, Stage('ingest', lambda results: harvest(channels_list)))
+    return stages
+
+
+def run_daily_pipeline(ingest=True):
+    """
+    The daily run: new posts are stored, then every report profile is summarized and posted
+    :return: PipelineRun
+    """
+    return run_pipeline(daily_stages(ingest=ingest))
+
+
+if __name__ == "__main__":
+    # One daily run in this process: python pipeline.py [--no-ingest]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run ingest, filter, summarize and publish once")
+    parser.add_argument('--no-ingest', action='store_true', help="report on the posts already stored")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    result = run_daily_pipeline(ingest=not args.no_ingest)
+    raise SystemExit(0 if result.ok else 1)
@@ -0,0 +1,114 @@
+import json
+import os
+from dataclasses import dataclass, replace
+
+# Keywords for Finland-related content in English, Russian, and Ukrainian
+keywords_regex = [
+    r"\bFinland(?:ic|ian)?\b",
+    r"\bFinn(?:ish)?\b",
+    r"\bФинлянд(?:(?:ия|ии|ие|ию|ией|ий))?\b",
+    r"\bфин(?:ский|ская|ское|ские|ского|скому|ским|ской|ских|скими)?\b",
+    r"\bФінлянді(?:(?:я|ї|ю|єю|їй))?\b",
+    r"\bфін(?:ський|ська|ське|ські|ського|ському|ським|ською|ських|ськими)?\b"
+]
+
+# Instructions for profiles without their own `system_prompt`
+SYSTEM_PROMPT_TEMPLATE = """You are an expert political analyst and journalist specializing in {adjective} affairs capable of summarizing and finding commonalities in Russian-language messages about {subject}. Focus exclusively on newsworthy developments:
+    - Major policy decisions and governmental actions
+    - Economic and trade developments
+    - Security and defense matters
+    - Diplomatic relations
+    - Infrastructure and strategic developments
+    - Any other significant national developments
+    
+    Exclude:
+    - Cultural events
+    - Social media discussions
+    - Entertainment news
+    - Human interest stories
+    - Anecdotal mentions
+    - Humor or entertainment
+    
+    Writing requirements:
+    1. Write in clear journalistic style
+    2. Always cite message IDs in parentheses within sentences
+    3. Focus on factual reporting
+    4. If only no newsworthy content exists, state (without making any summary): "Nothing newsworthy was mentioned the last day"
+    5. Maintain neutral, objective tone"""
+
+
+@dataclass(frozen=True)
+class ReportProfile:
+    """
+    One topic watchlist: what to look for, where, how to summarize it and where to post it.
+
+    topic: English topic name used in prompts and Slack texts ("Finland")
+    topic_fi: Finnish illative form used before "liittyvä" ("Suomeen")
+    keywords: regex patterns, see keyword_matcher
+    channels: channel usernames to watch, empty for every monitored channel
+    slack_channel_id: Slack destination, defaults to SLACK_CHANNEL_ID
+    topic_adjective: adjective of the topic for SYSTEM_PROMPT_TEMPLATE ("Finnish"), None to
+        use the topic itself
+    system_prompt: summarizer instructions, defaults to SYSTEM_PROMPT_TEMPLATE
+    semantic_query: text whose nearest posts (post_texts.embedding) are added to the
+        keyword matches, None to rely on the keywords only
+    """
+    name: str
+    topic: str
+    topic_fi: str
+    keywords: tuple
+    emoji: str = ''
+    channels: tuple = ()
+    slack_channel_id: str = None
+    topic_adjective: str = None
+    system_prompt: str = None
+    semantic_query: str = None
+
+    def get_system_prompt(self):
+        if self.system_prompt:
+            return self.system_prompt
+        if self.topic_adjective:
+            return SYSTEM_PROMPT_TEMPLATE.format(adjective=self.topic_adjective,
+                                                 subject=f"{self.topic} or {self.topic_adjective} topics")
+        return SYSTEM_PROMPT_TEMPLATE.format(adjective=self.topic, subject=self.topic)
+
+    def get_slack_channel_id(self):
+        return self.slack_channel_id or os.getenv('SLACK_CHANNEL_ID')
+
+
+FINLAND_PROFILE = ReportProfile(
+    name='finland',
+    topic='Finland',
+    topic_fi='Suomeen',
+    emoji='🇫🇮',
+    keywords=tuple(keywords_regex),
+    topic_adjective='Finnish',
+    semantic_query="Finland, Helsinki, the Finnish government and the Finnish border. "
+                   "Финляндия, Хельсинки, финское правительство, граница с Финляндией."
+)
+
+BUILTIN_PROFILES = {FINLAND_PROFILE.name: FINLAND_PROFILE}
+
+
+def load_profiles(path=None):
+    """
+    Report profiles declared in a JSON file (REPORT_PROFILES_FILE), the Finland profile without one.
+
+    The file holds a list of objects with the ReportProfile fields. An entry named
+    like a built-in profile only needs the fields it overrides.
+    """
+    path = path or os.getenv('REPORT_PROFILES_FILE')
+    if not path:
+        return [FINLAND_PROFILE]
+
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    profiles = []
+    for entry in entries:
+        for field in ('keywords', 'channels'):
+            if field in entry:
+                entry[field] = tuple(entry[field])
+        builtin = BUILTIN_PROFILES.get(entry['name'])
+        profiles.append(replace(builtin, **entry) if builtin else ReportProfile(**entry))
+    return profiles
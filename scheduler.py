@@ -2,9 +2,16 @@ import logging
 from logging.handlers import RotatingFileHandler
 import schedule
 import time
-import subprocess
 import sys
 
+from dotenv import load_dotenv
+
+# before the project imports, some of them read their settings at import time
+load_dotenv()
+
+from metrics import LAST_RUN, RUNS, serve
+from pipeline import run_daily_pipeline
+
 # Configure logging with rotation
 log_handler = RotatingFileHandler(
     './logs/scheduler.log',
@@ -21,36 +28,27 @@ logging.basicConfig(
     ]
 )
 
-def run_script(script_name):
-    try:
-        logging.info(f"Starting {script_name}")
-        result = subprocess.run([sys.executable, script_name], check=True)
-        if result.returncode == 0:
-            logging.info(f"{script_name} completed successfully")
-            return True
-        else:
-            logging.error(f"{script_name} failed with return code {result.returncode}")
-            return False
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error running {script_name}: {str(e)}")
-        return False
-    except Exception as e:
-        logging.error(f"Unexpected error running {script_name}: {str(e)}")
-        return False
 
 def daily_task():
     logging.info("Starting daily task")
-    
-    # Run channel_content.py first
-    if run_script('channel_content.py'):
-        # Only run teleflash.py if channel_content.py was successful
-        run_script('teleflash.py')
+
+    # ingest, filter, summarize and publish in this process, sharing one engine;
+    # the reports are skipped when ingesting fails
+    run = run_daily_pipeline()
+    outcome = 'ok' if run.ok else 'failed'
+    RUNS.labels(outcome).inc()
+    LAST_RUN.labels(outcome).set_to_current_time()
+    if run.ok:
+        logging.info("Daily task completed successfully")
     else:
-        logging.error("Skipping teleflash.py due to channel_content.py failure")
+        logging.error(f"Daily task incomplete: failed {run.failed}, skipped {run.skipped}")
 
 # Schedule the task to run at 9 AM every day
 schedule.every().day.at("06:00").do(daily_task)
 
+# /metrics on METRICS_PORT for as long as the scheduler runs
+serve()
+
 logging.info("Scheduler started. Will run scripts daily at 06:00")
 
 # Keep the script running
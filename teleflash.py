@@ -1,26 +1,132 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from sqlalchemy import create_engine, text
-from datetime import datetime
+from sqlalchemy import bindparam, text
+from datetime import date, datetime, timedelta, timezone
 import openai
-from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
-import tiktoken
+import argparse
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
 
+# before the project imports, some of them read their settings at import time
 load_dotenv()
+openai.api_key = os.getenv('OPENAI_API_KEY')
 
-def fetch_data_for_specific_channels(engine, target_channels):
-    """Fetch messages from the last 24 hours for specific channels."""
+from db.engine import get_engine
+from db.watermarks import advance_watermark, ingest_fence, load_watermarks
+from db.summaries import covered_msg_ids, latest_summary, save_summary, summary_source_messages
+from keyword_matcher import get_matcher
+from llm.cache import cached_completion
+from llm.ollama import get_client as get_ollama_client
+from llm.mapreduce import cited_ids, summarize_map_reduce
+from llm.packer import pack_prompt
+from llm.ratelimit import RateLimited, RetryableError, get_limiter, parse_retry_after
+from llm.tokens import count_chat_tokens
+from embeddings import EMBEDDING_DIM, get_embedder
+from pgvector.sqlalchemy import Vector
+from metrics import (
+    FILTER_CANDIDATES, FILTER_MESSAGES, FILTER_SELECTED, LLM_REQUEST_SECONDS, LLM_REQUESTS, LLM_TOKENS, SLACK_POST_SECONDS,
+    SLACK_POSTS, export, timed
+)
+from report_profiles import FINLAND_PROFILE, keywords_regex, load_profiles
+
+# chat model for summaries and translations; the prompt packer fills its context window
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+# account limits of OPENAI_MODEL, all requests of the process are scheduled to stay under them
+OPENAI_RPM = int(os.getenv('OPENAI_RPM', 3500))
+OPENAI_TPM = int(os.getenv('OPENAI_TPM', 90000))
+# failures worth retrying besides rate limits
+OPENAI_TRANSIENT_ERRORS = (
+    openai.error.APIError, openai.error.Timeout, openai.error.TryAgain,
+    openai.error.APIConnectionError, openai.error.ServiceUnavailableError
+)
+# single: one request with the messages that fit; map_reduce: every message, in chunks;
+# auto: map_reduce only when the messages don't fit into one request
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'auto')
+# chunk summaries requested at the same time in map_reduce mode
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', 4))
+NOTHING_NEWSWORTHY = "Nothing newsworthy was mentioned the last day"
+# translate: English summary, then a translation request (sequential);
+# single: one completion writing both languages; parallel: English and Finnish summaries at the same time
+BILINGUAL_MODE = os.getenv('BILINGUAL_MODE', 'single')
+FINNISH_MARKER = "=== SUOMEKSI ==="
+BILINGUAL_INSTRUCTIONS = f"""
+    After the English report, write a line containing only {FINNISH_MARKER} and then the complete
+    report again in Finnish, with the same structure ("Yleiskatsaus:" and "Keskeiset aiheet:") and
+    the message ID citations unchanged."""
+# full: every run reports on the posts of its window only (see report_window);
+# rolling: every run summarizes only the posts since today's stored report and merges them into it
+REPORT_MODE = os.getenv('REPORT_MODE', 'full')
+# start of the texts summarize_messages returns instead of a summary
+SUMMARY_ERROR_PREFIXES = ("Error", "OpenAI API error", "No messages found")
+
+# nearest-neighbour retrieval for profiles with a semantic_query
+SEMANTIC_LIMIT = int(os.getenv('SEMANTIC_LIMIT', 20))
+SEMANTIC_MAX_DISTANCE = float(os.getenv('SEMANTIC_MAX_DISTANCE', 0.5))
+# window of a report's first run, later runs start at the report's watermark
+REPORT_INITIAL_LOOKBACK_HOURS = float(os.getenv('REPORT_INITIAL_LOOKBACK_HOURS', 24))
+# posts published this many days before a window starts are left out of it even when ingested
+# within it; bounds pt.date so that PostgreSQL only scans the recent monthly partitions
+REPORT_MAX_INGEST_LAG_DAYS = int(os.getenv('REPORT_MAX_INGEST_LAG_DAYS', 7))
+
+def keywords_to_pg_regex(regex_patterns):
+    """
+    Combine Python keyword patterns into one PostgreSQL regular expression.
+
+    PostgreSQL spells the word boundary \\y (\\b means backspace there); the rest
+    of the syntax used by the keyword patterns is shared by both dialects.
+    """
+    return "|".join("(?:" + pattern.replace(r"\b", r"\y") + ")" for pattern in regex_patterns)
+
+
+def window_filter(since, until, params):
+    """
+    SQL condition selecting the posts of a report window, adding its bind parameters to `params`.
+
+    Posts ingested in [since, until) when `since` is given, else the posts of the last 24 hours.
+    A post is dated (UTC) before it is ingested: the window is also bounded on pt.date, the
+    partition key, from REPORT_MAX_INGEST_LAG_DAYS before `since` to the day after `until`.
+    The extra day keeps rows whose date was converted in a session time zone east of UTC,
+    before db.rows wrote UTC dates, inside the window.
+    """
+    if since is None:
+        return "pt.date >= NOW() - INTERVAL '24 hours'"
+    params.update(
+        since=since, until=until,
+        since_date=since.astimezone(timezone.utc).date() - timedelta(days=REPORT_MAX_INGEST_LAG_DAYS),
+        until_date=until.astimezone(timezone.utc).date() + timedelta(days=1),
+    )
+    return ("pt.date >= :since_date AND pt.date <= :until_date "
+            "AND pt.ingested_at >= :since AND pt.ingested_at < :until")
+
+
+def fetch_data_for_specific_channels(engine, target_channels, regex_patterns=None, since=None, until=None):
+    """
+    Fetch messages ingested in a report window (default: the last 24 hours) for specific channels.
+
+    With `regex_patterns` only candidate matches are returned: the patterns are
+    evaluated by PostgreSQL (case-insensitive regex, served by the pg_trgm index
+    on post_texts.message), filter_messages_with_regex stays the final check.
+
+    Raises on database errors: an empty result would move the report watermarks past the posts.
+    """
     print(f"Starting data fetch for specific channels at {datetime.now()}")
     
     target_channels_set = set(target_channels)
+    params = {"channel_usernames": list(target_channels_set)}
+
+    keyword_filter = ""
+    if regex_patterns:
+        keyword_filter = "AND pt.message ~* :keyword_regex"
+        params["keyword_regex"] = keywords_to_pg_regex(regex_patterns)
     
-    main_query = text("""
+    window = window_filter(since, until, params)
+
+    main_query = text(f"""
         SELECT 
             pt.id AS message_id,
             pt.message,
@@ -28,20 +134,23 @@ def fetch_data_for_specific_channels(engine, target_channels):
             pt.views,
             pt.forwards,
             c.title AS channel_title,
-            c.username AS channel_username
+            c.username AS channel_username,
+            pt.peer_id,
+            pt.ingested_at
         FROM post_texts pt
         JOIN channels c ON pt.peer_id = c.id
-        WHERE pt.date >= NOW() - INTERVAL '24 hours'
+        WHERE {window}
           AND c.username = ANY(:channel_usernames)
+          {keyword_filter}
         ORDER BY pt.date DESC
     """)
     
     try:
         with engine.connect() as conn:
-            print("Fetching messages from the last 24 hours...")
+            print(f"Fetching messages ingested since {since}..." if since else "Fetching messages from the last 24 hours...")
             result = conn.execute(
                 main_query, 
-                {"channel_usernames": list(target_channels_set)}
+                params
             ).fetchall()
             
             messages = [{
@@ -52,6 +161,8 @@ def fetch_data_for_specific_channels(engine, target_channels):
                 "forwards": row[4],
                 "channel_title": row[5],
                 "channel_username": row[6],
+                "peer_id": row[7],
+                "ingested_at": row[8],
             } for row in result]
             
             print(f"Total messages fetched: {len(messages)}")
@@ -59,8 +170,110 @@ def fetch_data_for_specific_channels(engine, target_channels):
             
     except Exception as e:
         print(f"Error during data fetch: {e}")
+        raise
+
+
+def count_window_posts(engine, target_channels, since=None, until=None):
+    """
+    Number of posts of specific channels in a report window, before any keyword filter.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        target_channels (list): Channel usernames.
+        since, until (datetime): Report window of post ingestion times, see window_filter.
+
+    Returns:
+        int: Number of posts.
+    """
+    params = {"channel_usernames": list(set(target_channels))}
+    window = window_filter(since, until, params)
+    query = text(f"""
+        SELECT COUNT(*)
+        FROM post_texts pt
+        JOIN channels c ON pt.peer_id = c.id
+        WHERE {window}
+          AND c.username = ANY(:channel_usernames)
+    """)
+    with engine.connect() as conn:
+        return conn.execute(query, params).scalar_one()
+
+def fetch_similar_posts(engine, target_channels, query_vector, limit=SEMANTIC_LIMIT,
+                        max_distance=SEMANTIC_MAX_DISTANCE, since=None, until=None):
+    """
+    Fetch the messages of a report window (default: the last 24 hours) closest to `query_vector` (cosine distance).
+
+    An exact search: the posts of the window are selected first (bounded on the partition key,
+    see window_filter) and then ranked by distance. The HNSW index on post_texts.embedding is
+    not used, it would only return its `ef_search` nearest candidates over every partition and
+    the window would filter nearly all of them out. Posts stored without an embedding are
+    never returned.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        target_channels (list): Channel usernames to search.
+        query_vector (list): Embedding produced by the same embedder as the stored posts.
+        limit (int): Maximum number of messages.
+        max_distance (float): Messages further away than this are dropped.
+        since, until (datetime): Report window of post ingestion times, see window_filter.
+
+    Returns:
+        list: Message dictionaries like fetch_data_for_specific_channels, plus 'distance'.
+    """
+    params = {
+        "query_vector": query_vector,
+        "channel_usernames": list(set(target_channels)),
+        "limit": limit,
+        "max_distance": max_distance,
+    }
+    window = window_filter(since, until, params)
+
+    # MATERIALIZED keeps the planner from ordering through the HNSW index and filtering afterwards
+    query = text(f"""
+        WITH window_posts AS MATERIALIZED (
+            SELECT 
+                pt.id AS message_id,
+                pt.message,
+                pt.date,
+                pt.views,
+                pt.forwards,
+                c.title AS channel_title,
+                c.username AS channel_username,
+                pt.peer_id,
+                pt.ingested_at,
+                pt.embedding <=> :query_vector AS distance
+            FROM post_texts pt
+            JOIN channels c ON pt.peer_id = c.id
+            WHERE {window}
+              AND c.username = ANY(:channel_usernames)
+              AND pt.embedding IS NOT NULL
+        )
+        SELECT *
+        FROM window_posts
+        WHERE distance <= :max_distance
+        ORDER BY distance
+        LIMIT :limit
+    """).bindparams(bindparam("query_vector", type_=Vector(EMBEDDING_DIM)))
+
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(query, params).fetchall()
+    except Exception as e:
+        print(f"Error during similarity search: {e}")
         return []
 
+    return [{
+        "message_id": row[0],
+        "message": row[1],
+        "date": row[2],
+        "views": row[3],
+        "forwards": row[4],
+        "channel_title": row[5],
+        "channel_username": row[6],
+        "peer_id": row[7],
+        "ingested_at": row[8],
+        "distance": row[9],
+    } for row in result]
+
 
 # Define the list of channels
 channels_list = [
@@ -96,16 +309,6 @@ channels_list = [
 # # Pipeline to fetch, summarize, and post to Slack
 # messages = fetch_data_for_specific_channels(engine, channels_list)
 
-# Keywords for Finland-related content in English, Russian, and Ukrainian
-keywords_regex = [
-    r"\bFinland(?:ic|ian)?\b",
-    r"\bFinn(?:ish)?\b",
-    r"\bФинлянд(?:(?:ия|ии|ие|ию|ией|ий))?\b",
-    r"\bфин(?:ский|ская|ское|ские|ского|скому|ским|ской|ских|скими)?\b",
-    r"\bФінлянді(?:(?:я|ї|ю|єю|їй))?\b",
-    r"\bфін(?:ський|ська|ське|ські|ського|ському|ським|ською|ських|ськими)?\b"
-]
-
 def filter_messages_with_regex(messages, regex_patterns=keywords_regex):
     """
     Filter messages based on a list of regex patterns.
@@ -119,81 +322,19 @@ def filter_messages_with_regex(messages, regex_patterns=keywords_regex):
     """
     if not messages:
         return []
-        
-    filtered_messages = []
-    compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in regex_patterns]
-    
-    for message in messages:
-        # Skip if message is None or empty
-        if not message.get('message'):
-            continue
-            
-        # Check each pattern against the message
-        for pattern in compiled_patterns:
-            if pattern.search(message['message']):
-                filtered_messages.append(message)
-                break  # Stop checking other patterns once a match is found
-                
-    return filtered_messages
-
-def summarize_with_openai(messages):
-    """Create a summary of messages using OpenAI with specific focus on Finnish topics."""
-    if not messages:
-        return "No messages found for summarization."
 
-    def create_telegram_link(channel_username, message_id):
-        """Create a Telegram message link."""
-        if not channel_username:
-            return str(message_id)
-        return f"<https://t.me/{channel_username}/{message_id}>"
-
-    def count_tokens(text):
-        """Count tokens for GPT-3.5-turbo model."""
-        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-        return len(encoding.encode(text))
-
-    # Prepare messages text with IDs and links
-    messages_text = "\n\n".join([
-        f"Message ID: {msg['message_id']}\n"
-        f"Channel: {msg['channel_title']} ({msg['channel_username']})\n"
-        f"Date: {msg['date']}\n"
-        f"Message: {msg['message'][:500]}\n"
-        f"Views: {msg['views']}, Forwards: {msg['forwards']}\n"
-        f"Link: {create_telegram_link(msg['channel_username'], msg['message_id'])}"
-        for msg in messages[:20]
-    ])
-
-    system_message = {
-        "role": "system", 
-        "content": """You are an expert political analyst and journalist specializing in Finnish affairs capable of summarizing and finding commonalities in Russian-language messages about Finland or Finnish topics. Focus exclusively on newsworthy developments:
-    - Major policy decisions and governmental actions
-    - Economic and trade developments
-    - Security and defense matters
-    - Diplomatic relations
-    - Infrastructure and strategic developments
-    - Any other significant national developments
-    
-    Exclude:
-    - Cultural events
-    - Social media discussions
-    - Entertainment news
-    - Human interest stories
-    - Anecdotal mentions
-    - Humor or entertainment
-    
-    Writing requirements:
-    1. Write in clear journalistic style
-    2. Always cite message IDs in parentheses within sentences
-    3. Focus on factual reporting
-    4. If only no newsworthy content exists, state (without making any summary): "Nothing newsworthy was mentioned the last day"
-    5. Maintain neutral, objective tone"""
-    }
-    
-    user_message = {
-        "role": "user",
-        "content": f"""Analyze these Finland-related messages for newsworthy developments and produce a summary based on them:
+    # compiled once per keyword profile into a single-pass matcher
+    return get_matcher(tuple(regex_patterns)).filter(messages)
+
+def summarize_with_openai(messages, profile=FINLAND_PROFILE, **options):
+    """Create a summary of messages using OpenAI with focus on the topic of the report profile."""
+    return summarize_messages(messages, profile, OPENAI_MODEL, openai_chat, **options)
+
+def summary_prompt(profile):
+    """User prompt summarizing the messages of a report profile, with a {messages_text} placeholder."""
+    return f"""Analyze these {profile.topic}-related messages for newsworthy developments and produce a summary based on them:
     
-    {messages_text}
+    {{messages_text}}
     
     If newsworthy content exists, structure your response as follows:
     
@@ -219,85 +360,359 @@ def summarize_with_openai(messages):
        - "According to (message ID)..."
        - "Several channels (message IDs) claimed that..."
        """
-    }
 
-    # Rest of the function remains exactly the same (token counting, API call, etc.)
+def merge_prompt(profile):
+    """User prompt merging summaries of a report profile into one, with a {messages_text} placeholder."""
+    return f"""Merge these partial summaries of {profile.topic}-related messages into one summary:
+    
+    {{messages_text}}
+    
+    Structure your response as follows:
+    
+    Overview:
+    [Two newlines after title]
+    Brief summary of key developments.
+    
+    Key Topics:
+    [Two newlines after title]
+    Detailed coverage of significant developments, with each development in its own paragraph.
+    
+    Requirements:
+    1. Keep every message ID citation exactly as written, in parentheses, e.g. (12345) or (12345, 12346)
+    2. Merge the citations of the same development into one pair of parentheses
+    3. Group related developments together and remove repetitions
+    4. Only include significant developments
+    5. Maintain professional writing style and neutral tone while attributing claims to sources
+    """
+
+def summarize_messages(messages, profile, model, complete, language=None, bilingual=False):
+    """
+    Create a summary of messages with any chat backend, map-reduce style when they don't fit one prompt.
+
+    Args:
+        messages (list): Message dictionaries to summarize.
+        profile (ReportProfile): Report profile giving topic and system prompt.
+        model (str): Model name, sets the token budget.
+        complete (callable): complete(chat_messages, max_tokens) -> text, raising on failure.
+        language (str): Language of the summary, English when None.
+        bilingual (bool): Return the summary followed by FINNISH_MARKER and its Finnish version.
+
+    Returns:
+        str: The summary or an error message.
+    """
+    if not messages:
+        return "No messages found for summarization."
+
+    user_template = summary_prompt(profile)
+    reduce_template = merge_prompt(profile)
+
+    system_prompt = profile.get_system_prompt()
+    if language:
+        system_prompt += f"\n\nWrite your answer in {language}. Keep message IDs in their original form."
 
-    # Count tokens and adjust if needed
-    prompt_tokens = count_tokens(system_message["content"]) + count_tokens(user_message["content"])
     max_response_tokens = 1500
-    total_tokens = prompt_tokens + max_response_tokens
-
-    # Adjust prompt if it exceeds token limit
-    if total_tokens > 4096:
-        excess_tokens = total_tokens - 4096
-        messages = messages[:max(1, 20 - excess_tokens // 200)]
-        messages_text = "\n\n".join([
-            f"Message ID: {msg['message_id']}\n"
-            f"Channel: {msg['channel_title']} ({msg['channel_username']})\n"
-            f"Date: {msg['date']}\n"
-            f"Message: {msg['message'][:300]}\n"
-            f"Views: {msg['views']}, Forwards: {msg['forwards']}\n"
-            f"Link: {create_telegram_link(msg['channel_username'], msg['message_id'])}"
-            for msg in messages
-        ])
-        user_message["content"] = user_message["content"].replace(
-            user_message["content"].split("\n\n")[1], 
-            messages_text
+    # the last request writes the report twice, English then Finnish
+    final_suffix = BILINGUAL_INSTRUCTIONS if bilingual else ""
+    final_max_tokens = 2 * max_response_tokens if bilingual else max_response_tokens
+    try:
+        # as many messages as the model's context window holds, by priority
+        chat_messages, packed = pack_prompt(
+            messages, model, system_prompt, user_template + final_suffix, final_max_tokens
+        )
+        if SUMMARY_MODE == 'single' or (SUMMARY_MODE == 'auto' and len(packed) == len(messages)):
+            print(f"Packed {len(packed)} of {len(messages)} messages into the {model} prompt")
+            return complete(chat_messages, final_max_tokens)
+
+        summary, chunks = summarize_map_reduce(
+            messages, model, complete, system_prompt, user_template, reduce_template,
+            max_response_tokens, concurrency=SUMMARY_CONCURRENCY,
+            skip=(NOTHING_NEWSWORTHY, f'"{NOTHING_NEWSWORTHY}"'),
+            final_suffix=final_suffix, final_max_tokens=final_max_tokens
         )
+        print(f"Summarized {len(messages)} messages in {chunks} chunks, "
+              f"{len(cited_ids(summary))} messages cited")
+        return summary
+    except openai.error.RateLimitError:
+        return "Error: Rate limit exceeded. Please try again later."
+    except openai.error.APIError as e:
+        return f"OpenAI API error: {str(e)}"
+    except Exception as e:
+        return f"Error generating summary: {str(e)}"
+
+
+def openai_chat(chat_messages, max_tokens, temperature=0.7, top_p=0.9):
+    """
+    One chat completion with OPENAI_MODEL, served from the response cache when the same
+    request succeeded before.
+
+    Args:
+        chat_messages (list): Chat messages ({"role": ..., "content": ...}).
+        max_tokens (int): Maximum completion tokens.
+        temperature (float): Sampling temperature.
+        top_p (float): Nucleus sampling mass.
+
+    Returns:
+        str: The completion text.
+
+    Raises:
+        openai.error.OpenAIError: When the last attempt failed as well.
+    """
+    params = {"max_tokens": max_tokens, "temperature": temperature, "top_p": top_p}
+    return llm_completion(
+        "openai", OPENAI_MODEL, params, chat_messages,
+        lambda: _openai_chat_uncached(chat_messages, **params)
+    )
+
 
-    max_retries = 3
-    retry_delay = 5
+def llm_completion(backend, model, params, chat_messages, request):
+    """
+    Completion through the response cache, with latency and outcome metrics of the requests sent.
+
+    Args:
+        backend (str): "openai" or "ollama".
+        model (str): Model name.
+        params (dict): Request parameters that change the answer.
+        chat_messages (list): Chat messages ({"role": ..., "content": ...}).
+        request (callable): Performs the request, raising on failure.
+
+    Returns:
+        str: The completion text.
+    """
+    sent = []
+
+    def complete():
+        sent.append(True)
+        with timed(LLM_REQUEST_SECONDS, LLM_REQUESTS, backend=backend, model=model):
+            return request()
 
-    for attempt in range(max_retries):
+    answer = cached_completion(backend, model, params, chat_messages, complete)
+    if not sent:
+        LLM_REQUESTS.labels(backend, model, 'cached').inc()
+    return answer
+
+
+def _openai_chat_uncached(chat_messages, max_tokens, temperature, top_p):
+    """Chat completion request scheduled within the OpenAI rate limits; raises on failure."""
+    def request():
         try:
             response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[system_message, user_message],
-                temperature=0.7,
-                max_tokens=max_response_tokens,
-                top_p=0.9,
+                model=OPENAI_MODEL,
+                messages=chat_messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p,
                 frequency_penalty=0.0,
                 presence_penalty=0.0
             )
-            return response.choices[0].message.content.strip()
-        except openai.error.RateLimitError:
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                return "Error: Rate limit exceeded. Please try again later."
-        except openai.error.APIError as e:
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-            else:
-                return f"OpenAI API error: {str(e)}"
-        except Exception as e:
-            return f"Error generating summary: {str(e)}"
+        except openai.error.RateLimitError as e:
+            raise RateLimited(str(e), parse_retry_after(e.headers)) from e
+        except OPENAI_TRANSIENT_ERRORS as e:
+            raise RetryableError(str(e), parse_retry_after(e.headers)) from e
+        LLM_TOKENS.labels("openai", OPENAI_MODEL, "prompt").inc(response.usage.prompt_tokens)
+        LLM_TOKENS.labels("openai", OPENAI_MODEL, "completion").inc(response.usage.completion_tokens)
+        return response.choices[0].message.content.strip()
+
+    # completions count against the TPM limit with their max_tokens
+    tokens = count_chat_tokens(chat_messages, OPENAI_MODEL) + max_tokens
+    limiter = get_limiter("openai", OPENAI_RPM, OPENAI_TPM)
+    try:
+        return limiter.call(request, tokens)
+    except RetryableError as e:
+        raise e.__cause__ or e
 
-    return "Failed to generate summary after multiple attempts."
 
+def ollama_chat(chat_messages, max_tokens, temperature=0.7, top_p=0.9):
+    """
+    One streamed chat completion from the local Ollama server, served from the response
+    cache when the same request succeeded before.
+
+    Args:
+        chat_messages (list): Chat messages ({"role": ..., "content": ...}).
+        max_tokens (int): Maximum completion tokens.
+        temperature (float): Sampling temperature.
+        top_p (float): Nucleus sampling mass.
+
+    Returns:
+        str: The completion text.
+
+    Raises:
+        OllamaError, requests.RequestException: When the request failed.
+    """
+    client = get_ollama_client()
+    params = {"max_tokens": max_tokens, "temperature": temperature, "top_p": top_p}
+
+    def on_usage(prompt_tokens, completion_tokens):
+        LLM_TOKENS.labels("ollama", client.model, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels("ollama", client.model, "completion").inc(completion_tokens)
 
-#saved like this for alternative summarization method
-def summarize_with_ollama(messages):
+    return llm_completion(
+        "ollama", client.model, params, chat_messages,
+        lambda: client.chat(chat_messages, **params, on_usage=on_usage)
+    )
+
+def summarize_with_ollama(messages, profile=FINLAND_PROFILE, **options):
     """Create a summary of messages using a local Ollama model."""
-    pass
+    return summarize_messages(messages, profile, get_ollama_client().model, ollama_chat, **options)
+
+# Set SUMMARY_METHOD to 1 for OpenAI or 2 for Ollama
+SUMMARY_METHOD = int(os.getenv('SUMMARY_METHOD', 1))
+def summarize_with_ai(messages, profile=FINLAND_PROFILE, **options):
+    """
+    Main function to summarize messages based on selected method.
 
-# Set this variable to 1 for OpenAI or 2 for Ollama
-SUMMARY_METHOD = 1
-def summarize_with_ai(messages):
-    """Main function to summarize messages based on selected method."""
+    Args:
+        messages (list): Message dictionaries to summarize.
+        profile (ReportProfile): Report profile giving topic and system prompt.
+        **options: `language` and `bilingual`, see summarize_messages.
+    """
     if SUMMARY_METHOD == 1:
-        return summarize_with_openai(messages)
+        return summarize_with_openai(messages, profile, **options)
     else:
-        return summarize_with_ollama(messages)
+        return summarize_with_ollama(messages, profile, **options)
+
+def summarize_bilingual(messages, profile=FINLAND_PROFILE):
+    """
+    Create the English and the Finnish report according to BILINGUAL_MODE.
+
+    Args:
+        messages (list): Message dictionaries to summarize.
+        profile (ReportProfile): Report profile giving topic and system prompt.
+
+    Returns:
+        tuple: (English summary, Finnish summary)
+    """
+    if BILINGUAL_MODE == 'parallel':
+        # both built from the source messages, neither waits for the other
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            english = pool.submit(summarize_with_ai, messages, profile)
+            finnish = pool.submit(summarize_with_ai, messages, profile, language="Finnish")
+            return english.result(), finnish.result()
+
+    if BILINGUAL_MODE == 'single':
+        return split_bilingual(summarize_with_ai(messages, profile, bilingual=True))
+
+    summary = summarize_with_ai(messages, profile)
+    return summary, translate_summary_to_finnish(summary)
+
+def split_bilingual(summary):
+    """Split a completion written with BILINGUAL_INSTRUCTIONS into (English, Finnish)."""
+    if FINNISH_MARKER in summary:
+        english, finnish = summary.split(FINNISH_MARKER, 1)
+        return english.strip(), finnish.strip()
+    # no Finnish part (error message or the model ignored the format)
+    return summary, translate_summary_to_finnish(summary)
+
+def summary_failed(summary):
+    """True for the error messages returned instead of a summary, which are never stored."""
+    return summary.startswith(SUMMARY_ERROR_PREFIXES)
+
+def merge_summaries(summaries, profile=FINLAND_PROFILE):
+    """
+    Merge an earlier report with the summary of the posts that arrived since, in both languages.
+
+    Args:
+        summaries (list): English summaries, oldest first.
+        profile (ReportProfile): Report profile giving topic and system prompt.
+
+    Returns:
+        tuple: (English summary, Finnish summary)
+    """
+    bilingual = BILINGUAL_MODE == 'single'
+    template = merge_prompt(profile) + (BILINGUAL_INSTRUCTIONS if bilingual else "")
+    chat_messages = [
+        {"role": "system", "content": profile.get_system_prompt()},
+        {"role": "user", "content": template.format(messages_text="\n\n---\n\n".join(summaries))},
+    ]
+    try:
+        merged = llm_chat(chat_messages, max_tokens=3000 if bilingual else 1500)
+    except Exception as e:
+        return f"Error generating summary: {str(e)}", ""
+    if bilingual:
+        return split_bilingual(merged)
+    return merged, translate_summary_to_finnish(merged)
+
+def build_report(engine, profile, messages):
+    """
+    Create today's report of a profile and store it with its cited posts.
+
+    In REPORT_MODE=rolling only the posts that arrived since today's stored report are
+    summarized and merged into it; without new posts the stored report is served again
+    without an LLM request.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        profile (ReportProfile): Report profile being reported on.
+        messages (list): Messages of the profile from the current fetch.
+
+    Returns:
+        tuple: (English summary, Finnish summary, messages the report is based on), the
+        latter include the posts cited by a merged earlier report.
+    """
+    today = date.today()
+    previous = None
+    if REPORT_MODE == 'rolling':
+        with engine.connect() as conn:
+            previous = latest_summary(conn, profile.name, today)
+            earlier = summary_source_messages(conn, previous.id) if previous is not None else []
+
+    if previous is None:
+        summary, finnish_summary = summarize_bilingual(messages, profile)
+        message_count = len(messages)
+        covered = covered_msg_ids(messages)
+    else:
+        covered_before = previous.covered_msg_ids or {}
+        new_messages = [msg for msg in messages
+                        if msg['message_id'] > covered_before.get(str(msg['peer_id']), 0)]
+        # the merged report cites earlier posts too, they are linked and stored as its sources
+        seen = {(msg['peer_id'], msg['message_id']) for msg in new_messages}
+        report_messages = new_messages + [msg for msg in earlier if (msg['peer_id'], msg['message_id']) not in seen]
+        if not new_messages:
+            print(f"Profile {profile.name}: no new messages, serving the report stored at {previous.created_at}")
+            return previous.summary, previous.summary_fi, report_messages
+
+        partial = summarize_with_ai(new_messages, profile)
+        if summary_failed(partial):
+            return partial, translate_summary_to_finnish(partial), new_messages
+        if partial.strip().strip('"') == NOTHING_NEWSWORTHY:
+            summary, finnish_summary = previous.summary, previous.summary_fi
+        elif previous.summary.strip().strip('"') == NOTHING_NEWSWORTHY:
+            summary, finnish_summary = partial, translate_summary_to_finnish(partial)
+        else:
+            summary, finnish_summary = merge_summaries([previous.summary, partial], profile)
+        message_count = previous.message_count + len(new_messages)
+        covered = covered_msg_ids(new_messages, covered_before)
+        messages = report_messages
+        print(f"Profile {profile.name}: {len(new_messages)} new messages merged into the stored report")
+
+    if not summary_failed(summary):
+        with engine.begin() as conn:
+            save_summary(conn, profile.name, today, summary, finnish_summary, messages,
+                         cited_ids(summary), covered, message_count)
+    return summary, finnish_summary, messages
+
+def llm_chat(chat_messages, max_tokens, temperature=0.7, top_p=0.9):
+    """Chat completion with the backend selected by SUMMARY_METHOD."""
+    chat = openai_chat if SUMMARY_METHOD == 1 else ollama_chat
+    return chat(chat_messages, max_tokens, temperature=temperature, top_p=top_p)
 
 # Slack and OpenAI credentials
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
-CHANNEL_ID = os.getenv('SLACK_CHANNEL_ID')
-client = WebClient(token=SLACK_BOT_TOKEN)
+_slack_client = None
+
+def get_slack_client():
+    """Slack WebClient, created when the first report is posted."""
+    global _slack_client
+    if _slack_client is None:
+        from slack_sdk import WebClient
+        _slack_client = WebClient(token=SLACK_BOT_TOKEN)
+    return _slack_client
+
+def slack_post(kind, **message):
+    """chat.postMessage with latency and outcome metrics by `kind`; raises SlackApiError like the client."""
+    with timed(SLACK_POST_SECONDS, SLACK_POSTS, kind=kind):
+        return get_slack_client().chat_postMessage(**message)
 
-def post_to_slack(messages, summary):
+def post_to_slack(messages, summary, profile=FINLAND_PROFILE):
     """Post enhanced summary and analysis to Slack."""
     if not messages:
         return "No messages to post."
@@ -406,7 +821,7 @@ def post_to_slack(messages, summary):
             "type": "header",
             "text": {
                 "type": "plain_text",
-                "text": "🇫🇮 Finland-Related Messages Summary"
+                "text": f"{profile.emoji} {profile.topic}-Related Messages Summary".strip()
             }
         },
         {
@@ -425,7 +840,7 @@ def post_to_slack(messages, summary):
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": "*🔍 Analysis of Messages about Finland and Generated Summary:*"
+                "text": f"*🔍 Analysis of Messages about {profile.topic} and Generated Summary:*"
             }
         },
         {
@@ -444,16 +859,16 @@ def post_to_slack(messages, summary):
                 {
                     "type": "mrkdwn",
                     "text": "*📊 Basic Metrics*\n"
-                    f"• Total Messages Analyzed (related to Finland): {metrics['total_messages']}\n"
+                    f"• Total Messages Analyzed (related to {profile.topic}): {metrics['total_messages']}\n"
                     f"• Total Views: {metrics['total_views']:,}\n"
                     f"• Total Forwards: {metrics['total_forwards']:,}"
                 },
                 {
                     "type": "mrkdwn",
                     "text": "*📈 Average Metrics*\n"
-                    f"• Avg Views/Post: {metrics['avg_views']:.1f} \n_(how many views each post related to Finland gets on average)_\n"
-                    f"• Avg Forwards/Post: {metrics['avg_forwards']:.1f} \n_(how many times each post related to Finland is shared on average)_\n"
-                    f"• Base Engagement: {metrics['engagement_rate']:.1f}% \n_(how many viewers share the content about Finland)_"
+                    f"• Avg Views/Post: {metrics['avg_views']:.1f} \n_(how many views each post related to {profile.topic} gets on average)_\n"
+                    f"• Avg Forwards/Post: {metrics['avg_forwards']:.1f} \n_(how many times each post related to {profile.topic} is shared on average)_\n"
+                    f"• Base Engagement: {metrics['engagement_rate']:.1f}% \n_(how many viewers share the content about {profile.topic})_"
                 }
             ]
         },
@@ -465,14 +880,14 @@ def post_to_slack(messages, summary):
                     "text": "*🔄 Advanced Engagement*\n"
                     f"• Views/Forwards Ratio: {metrics['views_to_forwards_ratio_avg']:.1f} \n_(how many people view before someone shares)_\n"
                     f"• Virality Score: {metrics['virality_score']:.1f}% \n_(how likely content is to spread: forwards/post ÷ views/forwards×100)_\n"
-                    f"• Unique Channels: {metrics['unique_channels']} \n_(number of different channels posting about Finland)_"
+                    f"• Unique Channels: {metrics['unique_channels']} \n_(number of different channels posting about {profile.topic})_"
                 },
                 {
                     "type": "mrkdwn",
                     "text": "*📊 Distribution Patterns*\n"
                     f"• Posts/Day: {metrics['posts_per_day']:.1f} \n_(average number of posts each day)_\n"
                     f"• Peak Daily Posts: {metrics['max_daily_posts']} \n_(highest number of posts in one day)_\n"
-                    f"• Channel Activity Ratio: {(metrics['total_messages'] / metrics['unique_channels']):.1f} \n_(average posts about Finland per channel)_"
+                    f"• Channel Activity Ratio: {(metrics['total_messages'] / metrics['unique_channels']):.1f} \n_(average posts about {profile.topic} per channel)_"
                 }
             ]
         },
@@ -488,16 +903,19 @@ def post_to_slack(messages, summary):
     ]
 
     try:
-        client.chat_postMessage(
-            channel=CHANNEL_ID, 
+        slack_post(
+            'report',
+            channel=profile.get_slack_channel_id(), 
             blocks=blocks, 
-            text=f"Finland News Intelligence Report ({current_time})",
+            text=f"{profile.topic} News Intelligence Report ({current_time})",
             unfurl_links=True,
             unfurl_media=True
         )
         print("Enhanced report posted successfully to Slack.")
+        return True
     except SlackApiError as e:
         print(f"Slack API error: {e}")
+        return False
 
 # post_to_slack(messages, summary)
 
@@ -525,19 +943,12 @@ def translate_summary_to_finnish(summary):
             "content": f"Translate the following text to Finnish:\n\n{summary}"
         }
         
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[system_message, user_message],
-            temperature=0.5,
-            max_tokens=1500
-        )
-        
-        return response.choices[0].message.content.strip()
+        return llm_chat([system_message, user_message], max_tokens=1500, temperature=0.5, top_p=1.0)
         
     except Exception as e:
         return f"Käännösvirhe: {str(e)}"
 
-def post_finnish_to_slack(messages, summary):
+def post_finnish_to_slack(messages, summary, profile=FINLAND_PROFILE):
     """Post enhanced summary and analysis to Slack."""
     if not messages:
         return "No messages to post."
@@ -645,7 +1056,7 @@ def post_finnish_to_slack(messages, summary):
             "type": "header",
             "text": {
                 "type": "plain_text",
-                "text": "🇫🇮 Suomeen liittyvien viestien yhteenveto"
+                "text": f"{profile.emoji} {profile.topic_fi} liittyvien viestien yhteenveto".strip()
             }
         },
         {
@@ -664,7 +1075,7 @@ def post_finnish_to_slack(messages, summary):
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": "*🔍 Suomea koskevien viestien analyysi ja yhteenveto:*"
+                "text": f"*🔍 {profile.topic_fi} liittyvien viestien analyysi ja yhteenveto:*"
             }
         },
         {
@@ -683,16 +1094,16 @@ def post_finnish_to_slack(messages, summary):
                 {
                     "type": "mrkdwn",
                     "text": "*📊 Perustiedot*\n"
-                    f"• Analysoituja viestejä (Suomeen liittyvät): {metrics['total_messages']}\n"
+                    f"• Analysoituja viestejä ({profile.topic_fi} liittyvät): {metrics['total_messages']}\n"
                     f"• Näyttökerrat yhteensä: {metrics['total_views']:,}\n"
                     f"• Edelleenlähetykset yhteensä: {metrics['total_forwards']:,}"
                 },
                 {
                     "type": "mrkdwn",
                     "text": "*📈 Keskiarvot*\n"
-                    f"• Näyttöjä/viesti: {metrics['avg_views']:.1f} \n_(kuinka monta näyttökertaa kukin Suomeen liittyvä viesti saa keskimäärin)_\n"
-                    f"• Edelleenlähetyksiä/viesti: {metrics['avg_forwards']:.1f} \n_(kuinka monta kertaa kutakin Suomeen liittyvää viestiä jaetaan keskimäärin)_\n"
-                    f"• Perussitouttavuus: {metrics['engagement_rate']:.1f}% \n_(kuinka moni katsojista jakaa Suomeen liittyvää sisältöä)_"
+                    f"• Näyttöjä/viesti: {metrics['avg_views']:.1f} \n_(kuinka monta näyttökertaa kukin {profile.topic_fi} liittyvä viesti saa keskimäärin)_\n"
+                    f"• Edelleenlähetyksiä/viesti: {metrics['avg_forwards']:.1f} \n_(kuinka monta kertaa kutakin {profile.topic_fi} liittyvää viestiä jaetaan keskimäärin)_\n"
+                    f"• Perussitouttavuus: {metrics['engagement_rate']:.1f}% \n_(kuinka moni katsojista jakaa {profile.topic_fi} liittyvää sisältöä)_"
                 }
             ]
         },
@@ -704,14 +1115,14 @@ def post_finnish_to_slack(messages, summary):
                     "text": "*🔄 Edistyneet sitoutumistiedot*\n"
                     f"• Näyttöjen/edelleenlähetysten suhde: {metrics['views_to_forwards_ratio_avg']:.1f} \n_(kuinka moni katsoo ennen kuin joku jakaa)_\n"
                     f"• Viraalisuuspisteet: {metrics['virality_score']:.1f}% \n_(sisällön leviämistodennäköisyys: edelleenlähetykset/viesti ÷ näytöt/edelleenlähetykset×100)_\n"
-                    f"• Eri kanavat: {metrics['unique_channels']} \n_(Suomesta julkaisevien kanavien määrä)_"
+                    f"• Eri kanavat: {metrics['unique_channels']} \n_({profile.topic_fi} liittyviä viestejä julkaisevien kanavien määrä)_"
                 },
                 {
                     "type": "mrkdwn",
                     "text": "*📊 Jakaumamallit*\n"
                     f"• Viestejä/päivä: {metrics['posts_per_day']:.1f} \n_(viestien keskimäärä päivässä)_\n"
                     f"• Päivän huippumäärä: {metrics['max_daily_posts']} \n_(suurin viestimäärä yhtenä päivänä)_\n"
-                    f"• Kanava-aktiivisuussuhde: {(metrics['total_messages'] / metrics['unique_channels']):.1f} \n_(Suomea koskevien viestien keskiarvo per kanava)_"
+                    f"• Kanava-aktiivisuussuhde: {(metrics['total_messages'] / metrics['unique_channels']):.1f} \n_({profile.topic_fi} liittyvien viestien keskiarvo per kanava)_"
                 }
             ]
         },
@@ -727,18 +1138,21 @@ def post_finnish_to_slack(messages, summary):
     ]
 
     try:
-        client.chat_postMessage(
-            channel=CHANNEL_ID, 
+        slack_post(
+            'report_fi',
+            channel=profile.get_slack_channel_id(), 
             blocks=blocks, 
-            text=f"Suomeen Liittyvien Viestien Yhteenveto (sama kuin edellinen suomeksi) ({current_time})",
+            text=f"{profile.topic_fi} Liittyvien Viestien Yhteenveto (sama kuin edellinen suomeksi) ({current_time})",
             unfurl_links=True,
             unfurl_media=True
         )
         print("Enhanced report posted successfully to Slack.")
+        return True
     except SlackApiError as e:
         print(f"Slack API error: {e}")
+        return False
 
-def post_no_messages_notification():
+def post_no_messages_notification(profile=FINLAND_PROFILE):
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
     today = datetime.now().strftime("%Y-%m-%d")
     
@@ -747,7 +1161,7 @@ def post_no_messages_notification():
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": f"*Today ({today}) no messages about Finland 🇫🇮 found in the selected channels!*"
+                "text": f"*Today ({today}) no messages about {profile.topic} {profile.emoji} found in the selected channels!*"
             }
         },
         {
@@ -766,7 +1180,7 @@ def post_no_messages_notification():
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": f"*Tänään ({today}) valituista kanavista ei löytynyt Suomeen 🇫🇮 liittyviä viestejä!*"
+                "text": f"*Tänään ({today}) valituista kanavista ei löytynyt {profile.topic_fi} {profile.emoji} liittyviä viestejä!*"
             }
         },
         {
@@ -781,35 +1195,227 @@ def post_no_messages_notification():
     ]
     
     try:
-        client.chat_postMessage(
-            channel=CHANNEL_ID,
+        slack_post(
+            'no_messages',
+            channel=profile.get_slack_channel_id(),
             blocks=english_blocks,
-            text=f"No messages about Finland found {today}",
+            text=f"No messages about {profile.topic} found {today}",
             unfurl_links=False
         )
         
-        client.chat_postMessage(
-            channel=CHANNEL_ID,
+        slack_post(
+            'no_messages_fi',
+            channel=profile.get_slack_channel_id(),
             blocks=finnish_blocks,
-            text=f"Ei Suomeen liittyviä viestejä {today}",
+            text=f"Ei {profile.topic_fi} liittyviä viestejä {today}",
             unfurl_links=False
         )
         print("No message alert posted successfully to Slack.")
+        return True
     except SlackApiError as e:
         print(f"Error posting to Slack: {e}")
+        return False
+
+def select_profile_messages(candidates, profiles, default_channels=channels_list):
+    """
+    Split the keyword candidates of one shared fetch between the report profiles.
+
+    Args:
+        candidates (list): Messages that matched the union of all profile keywords.
+        profiles (list): ReportProfile objects.
+        default_channels (list): Channels of the profiles that don't name their own.
+
+    Returns:
+        dict: Profile name to the messages of that profile.
+    """
+    selected = {}
+    for profile in profiles:
+        channels = {c.lower() for c in (profile.channels or default_channels)}
+        in_channels = [msg for msg in candidates if (msg['channel_username'] or '').lower() in channels]
+        # only the (few) candidates are scanned again, so a profile costs about the same as none
+        selected[profile.name] = filter_messages_with_regex(in_channels, profile.keywords)
+    return selected
+
+def add_similar_messages(engine, selected, profiles, window, default_channels=channels_list):
+    """
+    Extend the keyword matches of the profiles with a semantic_query by their nearest posts.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        selected (dict): Profile name to messages, extended in place.
+        profiles (list): ReportProfile objects.
+        window (tuple): Report window, see report_window.
+        default_channels (list): Channels of the profiles that don't name their own.
+    """
+    embedder = get_embedder()
+    if embedder is None:
+        return
+
+    starts, until = window
+    for profile in profiles:
+        if not profile.semantic_query:
+            continue
+        query_vector = embedder.embed([profile.semantic_query])[0]
+        similar = fetch_similar_posts(engine, profile.channels or default_channels, query_vector,
+                                      since=starts[profile.name], until=until)
+        seen = {(msg['channel_username'], msg['message_id']) for msg in selected[profile.name]}
+        added = [msg for msg in similar if (msg['channel_username'], msg['message_id']) not in seen]
+        selected[profile.name].extend(added)
+        FILTER_SELECTED.labels(profile.name, 'similarity').inc(len(added))
+        print(f"Profile {profile.name}: {len(added)} messages added by similarity")
+
+def report_window(engine, profiles):
+    """
+    The posts each report processes next: those ingested since its watermark (or within
+    REPORT_INITIAL_LOOKBACK_HOURS for a new report) up to the current ingest fence.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        profiles (list): ReportProfile objects to report on.
+
+    Returns:
+        tuple: (profile name to window start, window end shared by all profiles)
+    """
+    with engine.connect() as conn:
+        until = ingest_fence(conn)
+        watermarks = load_watermarks(conn, [profile.name for profile in profiles])
+    initial = until - timedelta(hours=REPORT_INITIAL_LOOKBACK_HOURS)
+    starts = {profile.name: watermarks.get(profile.name, initial) for profile in profiles}
+    print(f"Report window ends at {until}, starts at "
+          + ", ".join(f"{name} {start}" for name, start in starts.items()))
+    return starts, until
+
+def collect_report_messages(engine, profiles, window):
+    """
+    Messages of every report profile from a single fetch and a single matcher pass.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        profiles (list): ReportProfile objects to report on.
+        window (tuple): Report window, see report_window.
+
+    Returns:
+        dict: Profile name to the messages of that profile.
+    """
+    channels = list(dict.fromkeys(c for p in profiles for c in (p.channels or channels_list)))
+    keywords = tuple(dict.fromkeys(k for p in profiles for k in p.keywords))
+
+    # one fetch from the earliest watermark, each profile keeps the posts after its own
+    starts, until = window
+    messages = fetch_data_for_specific_channels(engine, channels, keywords,
+                                                since=min(starts.values()), until=until)
+    # the hit rate's denominator: every post of the window, not only the prefiltered ones
+    FILTER_MESSAGES.inc(count_window_posts(engine, channels, since=min(starts.values()), until=until))
+    FILTER_CANDIDATES.inc(len(messages))
+    candidates = filter_messages_with_regex(messages, keywords)
+    selected = select_profile_messages(candidates, profiles)
+    for profile in profiles:
+        selected[profile.name] = [msg for msg in selected[profile.name]
+                                  if msg['ingested_at'] >= starts[profile.name]]
+        FILTER_SELECTED.labels(profile.name, 'keywords').inc(len(selected[profile.name]))
+    add_similar_messages(engine, selected, profiles, window)
+    for profile in profiles:
+        print(f"Profile {profile.name}: {len(selected[profile.name])} messages")
+    return selected
+
+def summarize_reports(engine, profiles, selected):
+    """
+    Build and store the report of every profile that has messages.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        profiles (list): ReportProfile objects to report on.
+        selected (dict): Profile name to messages, see collect_report_messages.
+
+    Returns:
+        dict: Profile name to (English summary, Finnish summary, messages), see build_report.
+    """
+    return {
+        profile.name: build_report(engine, profile, selected[profile.name])
+        for profile in profiles if selected[profile.name]
+    }
+
+def publish_reports(profiles, reports):
+    """
+    Post the reports to Slack, and a notification for the profiles without messages.
+
+    Args:
+        profiles (list): ReportProfile objects to report on.
+        reports (dict): Profile name to (English summary, Finnish summary, messages).
+
+    Returns:
+        list: Names of the profiles whose report was created and posted.
+    """
+    published = []
+    for profile in profiles:
+        if profile.name in reports:
+            summary, finnish_summary, messages = reports[profile.name]
+            posted = post_to_slack(messages, summary, profile)
+            posted_fi = post_finnish_to_slack(messages, finnish_summary, profile)
+            ok = posted and posted_fi and not summary_failed(summary)
+        else:
+            ok = post_no_messages_notification(profile)
+        if ok:
+            published.append(profile.name)
+    return published
+
+def advance_watermarks(engine, names, until):
+    """
+    Mark the posts ingested before `until` as processed for the given reports, in one transaction.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        names (list): Profile names whose reports were published.
+        until (datetime): End of the report window.
+    """
+    with engine.begin() as conn:
+        for name in names:
+            advance_watermark(conn, name, until)
+
+def run_reports(engine, profiles):
+    """
+    Summarize and post every report profile, then advance the watermarks of the reports
+    that were published; the others process the same posts again on the next run.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        profiles (list): ReportProfile objects to report on.
+    """
+    window = report_window(engine, profiles)
+    selected = collect_report_messages(engine, profiles, window)
+    published = publish_reports(profiles, summarize_reports(engine, profiles, selected))
+    advance_watermarks(engine, published, window[1])
+
+def repost_reports(engine, profiles, day):
+    """
+    Post the stored reports of a day again, without fetching messages or LLM requests.
+
+    Args:
+        engine: SQLAlchemy engine of the message database.
+        profiles (list): ReportProfile objects to post.
+        day (date): Date of the reports.
+    """
+    with engine.connect() as conn:
+        for profile in profiles:
+            stored = latest_summary(conn, profile.name, day)
+            if stored is None:
+                print(f"Profile {profile.name}: no report stored for {day}")
+                continue
+            sources = summary_source_messages(conn, stored.id)
+            if not sources:
+                print(f"Profile {profile.name}: the report of {day} cites no stored posts")
+                continue
+            post_to_slack(sources, stored.summary, profile)
+            post_finnish_to_slack(sources, stored.summary_fi, profile)
 
 def main():
-    # Replace with your PostgreSQL credentials
-    db_user = os.getenv('DB_USER')
-    db_password = os.getenv('DB_PASSWORD')
-    db_host = os.getenv('DB_HOST')
-    db_name = os.getenv('DB_NAME')
-    
-    # Create a connection string
-    connection_string = f'postgresql://{db_user}:{db_password}@{db_host}/{db_name}'
-    openai.api_key = os.getenv('OPENAI_API_KEY')
-    # Create a SQLAlchemy engine
-    engine = create_engine(connection_string)
+    parser = argparse.ArgumentParser(description="Summarize the last day's messages and post the reports to Slack")
+    parser.add_argument('--repost', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help="post the reports stored for this date again instead of creating new ones")
+    args = parser.parse_args()
+
+    # PostgreSQL credentials come from DB_USER, DB_PASSWORD, DB_HOST and DB_NAME
+    engine = get_engine()
 
     # Test database connection
     try:
@@ -818,16 +1424,12 @@ def main():
     except Exception as e:
         print(f"Database connection failed: {e}")
     
-    # Process messages
-    messages = fetch_data_for_specific_channels(engine, channels_list)
-    filtered_messages = filter_messages_with_regex(messages, keywords_regex)
-    if filtered_messages:
-        summary = summarize_with_ai(filtered_messages)
-        post_to_slack(filtered_messages, summary)
-        finnish_summary = translate_summary_to_finnish(summary)
-        post_finnish_to_slack(filtered_messages, finnish_summary)
+    # Process messages, or post stored reports again
+    if args.repost:
+        repost_reports(engine, load_profiles(), args.repost)
     else:
-        post_no_messages_notification()
+        run_reports(engine, load_profiles())
+    export()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
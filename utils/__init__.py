@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 # Import modules
-import pandas as pd
 import asyncio
 import json
 import os
@@ -35,8 +34,19 @@ def get_config_attrs(path: str = './config/config.ini') -> dict:
     return dict(attrs)
 
 
-# event loop
-loop = asyncio.get_event_loop()
+# event loop, created on first use instead of on import
+_loop = None
+
+
+def get_loop():
+    """
+    Event loop of the synchronous helpers below
+    :return: asyncio event loop
+    """
+    global _loop
+    if _loop is None:
+        _loop = asyncio.get_event_loop()
+    return _loop
 
 '''
 
@@ -66,7 +76,7 @@ def process_participants_count(client, channel_id):
 
     :return: participants count
     """
-    channel_request = loop.run_until_complete(
+    channel_request = get_loop().run_until_complete(
         full_channel_req(client, channel_id)
     )
 
@@ -121,7 +131,7 @@ def write_collected_chats(
 
                     # Telegram API -> full channel request
                     try:
-                        channel_request = loop.run_until_complete(
+                        channel_request = get_loop().run_until_complete(
                             full_channel_req(client, id_)
                         )
 
@@ -177,6 +187,8 @@ def write_collected_chats(
         except KeyError:
             pass
 
+    import pandas as pd
+
     df = pd.DataFrame(metadata)
     csv_path = f'{output_folder}/collected_chats.csv'
     df.to_csv(
@@ -197,6 +209,8 @@ def timestamp_attrs(data, col='date'):
     :param col:
     :return:
     """
+    import pandas as pd
+
     t = pd.to_datetime(
         data[col],
         infer_datetime_format=True,
@@ -295,6 +309,8 @@ def get_forward_attrs(msg, res, channels_data):
         channel_name = None
 
     # process dates
+    import pandas as pd
+
     t = pd.to_datetime(
         date,
         infer_datetime_format=True,
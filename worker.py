@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+
+from dotenv import load_dotenv
+
+# before the project imports, some of them read their settings at import time
+load_dotenv()
+
+from api import RequestBudget, get_connection
+from channel_content import (
+    sfile, api_id, api_hash, phone, channels_list, process_channel, resolve_channels,
+    HARVEST_CONCURRENCY, HARVEST_RATE, HARVEST_BURST
+)
+from db.engine import get_engine
+from db.jobs import JOB_LEASE_SECONDS, claim_jobs, enqueue_channels, finish_job, queue_counts, unfinished_channels
+from db.partitions import maintain_partitions
+from metrics import export, serve
+
+# seconds between polls of an empty queue with --wait, and while waiting for other workers
+WORKER_POLL_SECONDS = float(os.getenv('WORKER_POLL_SECONDS', 10))
+
+
+def worker_name(session_file):
+    return f"{socket.gethostname()}:{os.getpid()}:{os.path.basename(session_file)}"
+
+
+def enqueue(channels):
+    """
+    Queue an ingest job per channel, after the partition maintenance a run starts with
+    :return: number of jobs queued
+    """
+    maintain_partitions(get_engine())
+    with get_engine().begin() as conn:
+        count = enqueue_channels(conn, channels)
+    logging.info(f"Queued {count}/{len(channels)} channels")
+    return count
+
+
+def _claim(worker):
+    with get_engine().begin() as conn:
+        channels = claim_jobs(conn, worker, 1)
+    return channels[0] if channels else None
+
+
+def _finish(channel, worker, error=None):
+    with get_engine().begin() as conn:
+        finish_job(conn, channel, worker, error)
+
+
+def _counts():
+    with get_engine().connect() as conn:
+        return queue_counts(conn)
+
+
+async def drain_queue(session_file=sfile, account_phone=phone, concurrency=HARVEST_CONCURRENCY,
+                      rate=HARVEST_RATE, burst=HARVEST_BURST, wait=False):
+    """
+    Claim and ingest channel jobs on one Telegram session until the queue is empty.
+
+    Every worker process uses its own session file (and account), so its requests count
+    against its own limits; `concurrency` jobs are processed at the same time.
+    :param wait: keep polling an empty queue instead of returning
+    :return: (channels done, channels failed) by this worker
+    """
+    worker = worker_name(session_file)
+    client = await get_connection(session_file, api_id, api_hash, account_phone)
+    logging.info(f"Worker {worker} connected")
+
+    # surface every FloodWaitError so the shared budget can pause all tasks
+    client.flood_sleep_threshold = 0
+
+    budget = RequestBudget(rate=rate, burst=burst)
+    done, failed = [], []
+
+    async def task():
+        while True:
+            channel = await asyncio.to_thread(_claim, worker)
+            if channel is None:
+                if not wait:
+                    return
+                await asyncio.sleep(WORKER_POLL_SECONDS)
+                continue
+            try:
+                peers = await resolve_channels(client, budget, [channel])
+                if channel not in peers:
+                    raise ValueError("channel could not be resolved")
+                await process_channel(client, budget, channel, peers[channel])
+            except Exception as e:
+                logging.error(f"Error processing channel {channel}: {e}")
+                failed.append(channel)
+                await asyncio.to_thread(_finish, channel, worker, str(e))
+            else:
+                done.append(channel)
+                await asyncio.to_thread(_finish, channel, worker)
+
+    try:
+        await asyncio.gather(*(task() for _ in range(concurrency)))
+    finally:
+        await client.disconnect()
+
+    logging.info(f"Worker {worker}: {len(done)} channels done, {len(failed)} failed")
+    return done, failed
+
+
+def run_queued_ingest(channels, session_file=sfile):
+    """
+    Queue the channels, work on the queue in this process and wait for the other workers
+    to finish theirs, for the pipeline's ingest stage
+    :return: channels whose job did not succeed
+    """
+    enqueue(channels)
+
+    # jobs held by other workers; an abandoned one is claimed again once its lease expires
+    asyncio.run(drain_queue(session_file))
+    deadline = time.monotonic() + JOB_LEASE_SECONDS
+    while time.monotonic() < deadline:
+        counts = _counts()
+        if counts.get('pending'):
+            # released again by a failed attempt or an expired lease
+            asyncio.run(drain_queue(session_file))
+        elif counts.get('running'):
+            logging.info(f"Waiting for other workers: {counts['running']} jobs running")
+            time.sleep(WORKER_POLL_SECONDS)
+        else:
+            break
+
+    with get_engine().connect() as conn:
+        failed = unfinished_channels(conn, channels)
+    logging.info(f"Processed {len(channels) - len(failed)}/{len(channels)} channels")
+    return failed
+
+
+if __name__ == "__main__":
+    # python worker.py --enqueue                      queue every channel of channels_list
+    # python worker.py --session account2.session     drain the queue with another account
+    parser = argparse.ArgumentParser(description="Ingest channels from the channel_jobs queue")
+    parser.add_argument('--enqueue', action='store_true', help="queue a job per channel of channels_list and exit")
+    parser.add_argument('--status', action='store_true', help="print the number of jobs per status and exit")
+    parser.add_argument('--session', default=sfile, help="Telethon session file of this worker (SESSION_FILE)")
+    parser.add_argument('--phone', default=phone, help="phone number of the session's account, for the first login")
+    parser.add_argument('--concurrency', type=int, default=HARVEST_CONCURRENCY)
+    parser.add_argument('--wait', action='store_true', help="keep polling when the queue is empty")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.enqueue:
+        enqueue(channels_list)
+    elif args.status:
+        print(_counts())
+    else:
+        if args.wait:
+            serve()
+        asyncio.run(drain_queue(args.session, args.phone, args.concurrency, wait=args.wait))
+        export()